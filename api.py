@@ -0,0 +1,187 @@
+import gzip
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from flask import Blueprint, Response, current_app, request
+from flask_login import current_user, login_required
+from sqlalchemy import select
+
+import conditional
+from export import EXPORT_MODELS
+from model import db
+from pagination import paginate, sortable_columns
+
+try:
+    import brotli
+except ImportError:  # brotli — необязательная зависимость, без неё сжимаем только gzip
+    brotli = None
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Таблицы, которые видит роль user (как на страницах /table/<name>)
+USER_TABLES = {'clients', 'reviews', 'purchased', 'rooms', 'equipment', 'sport_types', 'subscriptions', 'trainers',
+               'schedule'}
+
+OPERATORS = {
+    'eq': lambda column, value: column == value,
+    'gt': lambda column, value: column > value,
+    'gte': lambda column, value: column >= value,
+    'lt': lambda column, value: column < value,
+    'lte': lambda column, value: column <= value,
+}
+
+PAGING_ARGS = {'fields', 'sort', 'per_page', 'after', 'before'}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def json_default(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def json_response(data, status=200):
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=json_default)
+    return Response(body, status=status, mimetype='application/json')
+
+
+def parse_value(column, value):
+    python_type = column.type.python_type
+    if python_type is bool:
+        return value.lower() in ('1', 'true', 'yes')
+    if python_type in (date, datetime, time):
+        return python_type.fromisoformat(value)
+    return python_type(value)
+
+
+def filter_columns(model):
+    """Колонки, по которым можно фильтровать: первичный ключ и первые колонки индексов."""
+    table = model.__table__
+    keys = {column.key for column in table.primary_key.columns}
+    keys.update(index.expressions[0].key for index in table.indexes if hasattr(index.expressions[0], 'key'))
+    return {key: table.columns[key] for key in keys}
+
+
+def get_model(table_name):
+    model = EXPORT_MODELS.get(table_name)
+    if model is None:
+        raise ApiError(f'unknown table {table_name!r}', 404)
+    if current_user.role != 'admin' and table_name not in USER_TABLES:
+        raise ApiError('forbidden', 403)
+    return model
+
+
+def selected_columns(model):
+    names = [name.strip() for name in request.args.get('fields', '').split(',') if name.strip()]
+    columns = model.__table__.columns
+    unknown = [name for name in names if name not in columns]
+    if unknown:
+        raise ApiError(f'unknown fields: {", ".join(unknown)}')
+    return [columns[name] for name in names] if names else list(columns)
+
+
+def filters(model):
+    """?column=value, ?column__gte=value и т. п. — только по индексированным колонкам."""
+    allowed = filter_columns(model)
+    conditions = []
+    for arg, values in request.args.lists():
+        if arg in PAGING_ARGS:
+            continue
+        name, _, op = arg.partition('__')
+        op = op or 'eq'
+        if name not in allowed or op not in OPERATORS:
+            raise ApiError(f'cannot filter on {arg!r}; indexed columns: {", ".join(sorted(allowed))}')
+        for value in values:
+            try:
+                conditions.append(OPERATORS[op](getattr(model, name), parse_value(allowed[name], value)))
+            except ValueError:
+                raise ApiError(f'bad value for {arg!r}: {value!r}')
+    return conditions
+
+
+@bp.errorhandler(ApiError)
+def api_error(exc):
+    return json_response({'error': str(exc)}, exc.status)
+
+
+@bp.route('/')
+@login_required
+def tables():
+    return json_response({
+        table_name: {
+            'columns': [column.key for column in model.__table__.columns],
+            'filters': sorted(filter_columns(model)),
+            'sort': sorted(sortable_columns(model)),
+        }
+        for table_name, model in EXPORT_MODELS.items()
+        if current_user.role == 'admin' or table_name in USER_TABLES
+    })
+
+
+@bp.route('/<table_name>')
+@login_required
+@conditional.listing(lambda table_name: [table_name])
+def rows(table_name):
+    model = get_model(table_name)
+    columns = selected_columns(model)
+    pk = getattr(model, model.__mapper__.primary_key[0].key)
+
+    # Колонки курсора нужны в запросе, даже если их не просили в fields
+    query_columns = list(columns)
+    sort_column = sortable_columns(model).get(request.args.get('sort', '').lstrip('-'))
+    for column in (pk, sort_column):
+        if column is not None and column.key not in {c.key for c in query_columns}:
+            query_columns.append(model.__table__.columns[column.key])
+
+    # Выбираются только колонки, без создания ORM-объектов
+    query = db.session.query(*query_columns).filter(*filters(model))
+    page = paginate(query, pk)
+    keys = [column.key for column in columns]
+    return json_response({
+        'items': [{key: row._mapping[key] for key in keys} for row in page.items],
+        'next': page.next_cursor,
+        'prev': page.prev_cursor,
+        'next_url': page.next_url,
+        'prev_url': page.prev_url,
+    })
+
+
+@bp.route('/<table_name>/<int:pk>')
+@login_required
+def row(table_name, pk):
+    model = get_model(table_name)
+    columns = selected_columns(model)
+    result = db.session.execute(select(*columns).where(model.__mapper__.primary_key[0] == pk)).first()
+    if result is None:
+        raise ApiError('not found', 404)
+    return json_response(dict(zip([column.key for column in columns], result)))
+
+
+@bp.after_request
+def compress(response):
+    """gzip или brotli для ответов API, если клиент их принимает."""
+    min_size = current_app.config['API_COMPRESS_MIN_SIZE']
+    if response.direct_passthrough or response.status_code != 200 or 'Content-Encoding' in response.headers \
+            or response.content_length is None or response.content_length < min_size:
+        return response
+    response.vary.add('Accept-Encoding')
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br'] and accepted['br'] >= accepted['gzip']:
+        response.set_data(brotli.compress(response.get_data(), quality=current_app.config['API_BROTLI_QUALITY']))
+        response.headers['Content-Encoding'] = 'br'
+    elif accepted['gzip']:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=current_app.config['API_GZIP_LEVEL']))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def init_app(app):
+    app.register_blueprint(bp)
@@ -0,0 +1,138 @@
+# ASGI-режим: uvicorn asgi:app --workers 4
+# Поиск, справочные API и расписание на неделю обслуживаются асинхронно (SQLAlchemy asyncio + asyncpg),
+# все остальные страницы и формы — тем же Flask-приложением через WSGI-адаптер.
+# Зависимости: starlette, a2wsgi, asyncpg (aiosqlite для SQLite), uvicorn.
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, RedirectResponse
+from starlette.routing import Mount, Route
+
+from app import app as flask_app, fresh_user_cache, user_cache
+from model import User
+import db_pool
+import lookups
+
+config = flask_app.config
+engine = create_async_engine(db_pool.async_url(config), **db_pool.async_engine_options(config))
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def session_user(request):
+    """Пользователь из cookie сессии Flask (тот же SECRET_KEY), как load_user в app.py.
+
+    Возвращает пользователя и изменённые данные сессии (None, если cookie переписывать не нужно).
+    """
+    cookie = request.cookies.get(flask_app.session_interface.get_cookie_name(flask_app))
+    if not cookie:
+        return None, None
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    try:
+        data = serializer.loads(cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return None, None
+
+    user_id = data.get('_user_id')
+    if user_id is None:
+        return None, None
+    cached = fresh_user_cache(data, user_id)
+    if cached:
+        return cached, None
+    async with Session() as session:
+        user = await session.get(User, int(user_id))
+    if user is None:
+        data.pop('user_cache', None)
+        return None, data
+    data['user_cache'] = user_cache(user)
+    return data['user_cache'], data
+
+
+def save_session(response, data):
+    """Подписанная cookie сессии с обновлёнными данными — с теми же параметрами, что ставит Flask."""
+    interface = flask_app.session_interface
+    expires = datetime.now(timezone.utc) + flask_app.permanent_session_lifetime if data.get('_permanent') else None
+    response.set_cookie(interface.get_cookie_name(flask_app), interface.get_signing_serializer(flask_app).dumps(data),
+                        expires=expires, path=interface.get_cookie_path(flask_app),
+                        domain=interface.get_cookie_domain(flask_app), secure=interface.get_cookie_secure(flask_app),
+                        httponly=interface.get_cookie_httponly(flask_app),
+                        samesite=interface.get_cookie_samesite(flask_app))
+    response.headers.append('Vary', 'Cookie')
+
+
+def login_required(endpoint):
+    async def wrapper(request):
+        request.state.user, changed = await session_user(request)
+        if request.state.user is None:
+            # Как Flask-Login: на страницу входа с возвратом обратно
+            response = RedirectResponse('/login?' + urlencode({'next': str(request.url)}), status_code=302)
+        else:
+            response = await endpoint(request)
+        if changed is not None:
+            # Перечитанный пользователь сохраняется в cookie, как это делает load_user
+            save_session(response, changed)
+        return response
+    return wrapper
+
+
+async def fetch(stmt):
+    async with Session() as session:
+        return (await session.execute(stmt)).all()
+
+
+@login_required
+async def search_clients(request):
+    return JSONResponse(lookups.client_items(await fetch(lookups.search_clients(request.query_params, config))))
+
+
+@login_required
+async def search_purchased(request):
+    return JSONResponse(lookups.purchased_items(await fetch(lookups.search_purchased(request.query_params, config))))
+
+
+@login_required
+async def search_schedule(request):
+    return JSONResponse(lookups.schedule_items(await fetch(lookups.search_schedule(request.query_params, config))))
+
+
+@login_required
+async def week_schedule(request):
+    return JSONResponse(lookups.week_schedule_items(await fetch(lookups.week_schedule(request.query_params))))
+
+
+@login_required
+async def active_subscription(request):
+    id_client = request.path_params['id_client']
+    date = request.query_params.get('date')
+    try:
+        day = lookups.parse_date(date) if date else datetime.now().date()
+    except ValueError:
+        return JSONResponse({'error': 'date must be YYYY-MM-DD'}, status_code=400)
+
+    async with Session() as session:
+        purchased = (await session.scalars(lookups.active_subscription(id_client, day))).first()
+    return JSONResponse(lookups.active_subscription_item(id_client, day, purchased))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await engine.dispose()
+
+
+app = Starlette(
+    routes=[
+        Route('/api/search/clients', search_clients),
+        Route('/api/search/purchased', search_purchased),
+        Route('/api/search/schedule', search_schedule),
+        Route('/api/schedule', week_schedule),
+        Route('/api/clients/{id_client:int}/active_subscription', active_subscription),
+        # Всё остальное, включая формы и HTML-таблицы, — без изменений во Flask
+        Mount('/', WSGIMiddleware(flask_app)),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,94 @@
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import delete, update
+
+import crud
+import occupancy
+import rollups
+import versioning
+from export import EXPORT_MODELS
+from importer import parse_attendance
+from model import Record
+
+# Таблицы, где удалять и править может не только администратор (как delete_review/delete_purchased)
+OPEN_TABLES = {table.name for table in crud.TABLES if table.open}
+
+# Колонки, которые можно массово изменить: значение приводится функцией
+UPDATABLE = {
+    'records': {'attendance': parse_attendance},
+    'purchased': {'date_of_subscription_end': date.fromisoformat},
+    'equipment': {'id_rooms': int},
+    'rooms': {'capacity': int},
+    'subscriptions': {'price': Decimal},
+}
+
+
+class BatchError(Exception):
+    pass
+
+
+def allowed(table_name, role):
+    return table_name in EXPORT_MODELS and (role == 'admin' or table_name in OPEN_TABLES)
+
+
+def parse_ids(values, limit):
+    # Строка из JSON иначе разобралась бы по символам: "12" — это строки 1 и 2
+    if not isinstance(values, list):
+        raise BatchError('ids must be a list of integers')
+    try:
+        ids = sorted({int(value) for value in values})
+    except (TypeError, ValueError):
+        raise BatchError('ids must be integers')
+    if not ids:
+        raise BatchError('no rows selected')
+    if len(ids) > limit:
+        raise BatchError(f'at most {limit} rows per operation')
+    return ids
+
+
+def refresh_records(session, slots, booked=True):
+    """Сводка посещаемости и счётчики мест пересчитываются только по затронутым занятиям и датам."""
+    if not slots:
+        return
+    rollups.rebuild_slots(session, slots)
+    if booked:
+        occupancy.rebuild_slots(session, slots)
+
+
+def delete_rows(session, table_name, ids):
+    """DELETE ... WHERE pk IN (...) одним запросом; возвращает число удалённых строк."""
+    model = EXPORT_MODELS[table_name]
+    pk = model.__mapper__.primary_key[0]
+    stmt = delete(model.__table__).where(pk.in_(ids))
+    if model is Record:
+        slots = session.execute(stmt.returning(Record.id_schedule, Record.date_of_record)).all()
+        count = len(slots)
+        refresh_records(session, set(slots))
+    else:
+        count = session.execute(stmt).rowcount
+    versioning.mark_changed(session, {table_name})
+    return count
+
+
+def update_rows(session, table_name, ids, column, value):
+    """UPDATE ... SET column = value WHERE pk IN (...) одним запросом."""
+    parsers = UPDATABLE.get(table_name, {})
+    if column not in parsers:
+        raise BatchError(f'{table_name}.{column} cannot be changed in bulk')
+    try:
+        value = parsers[column](value)
+    except (TypeError, ValueError, InvalidOperation) as exc:
+        raise BatchError(f'bad value for {column}: {exc}')
+
+    model = EXPORT_MODELS[table_name]
+    pk = model.__mapper__.primary_key[0]
+    stmt = update(model.__table__).where(pk.in_(ids)).values({column: value})
+    if model is Record:
+        slots = session.execute(stmt.returning(Record.id_schedule, Record.date_of_record)).all()
+        count = len(slots)
+        refresh_records(session, set(slots), booked=False)
+    else:
+        count = session.execute(stmt).rowcount
+    versioning.mark_changed(session, {table_name})
+    return count
@@ -0,0 +1,145 @@
+import argparse
+import json
+import statistics
+import time
+
+from sqlalchemy import event
+
+from app import app
+from model import db, Client, Purchased, Record
+
+LISTINGS = ['clients', 'reviews', 'payment_types', 'rooms', 'equipment', 'sport_types', 'subscriptions',
+            'purchased', 'trainers', 'schedule', 'records']
+BATCH_ROWS = 10000
+
+
+class Statements:
+    """Счётчик SQL-запросов движка за время одного HTTP-запроса."""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self.before_cursor_execute)
+
+    def before_cursor_execute(self, *args):
+        self.count += 1
+
+
+def login(client, username='admin', password='1234'):
+    response = client.post('/login', data={'username': username, 'password': password})
+    assert response.status_code == 302, f'login failed: {response.status_code}'
+
+
+def scenarios(client):
+    """(название, функция запроса) для основных маршрутов."""
+    with app.app_context():
+        last_client = db.session.query(db.func.max(Client.id_client)).scalar()
+        last_purchased = db.session.query(db.func.max(Purchased.id_purchased)).scalar()
+        last_record = db.session.query(db.func.max(Record.id_records)).scalar()
+        # Массовая отметка посещения тем же значением: полная стоимость операции, данные не меняются
+        attended_ids = [id_records for (id_records,) in db.session.query(Record.id_records)
+                        .filter(Record.attendance == 'Да').order_by(Record.id_records).limit(BATCH_ROWS)]
+
+    def new_client_id():
+        with app.app_context():
+            return db.session.query(db.func.max(Client.id_client)).scalar()
+
+    client_form = {'full_name': 'Benchmark Client', 'date_of_birth': '1990-01-01', 'gender': 'М',
+                   'phone_number': '+70000000000'}
+
+    def add_edit_delete_client():
+        client.post('/add_client', data=client_form)
+        id_client = new_client_id()
+        client.post(f'/edit_client/{id_client}', data=dict(client_form, full_name='Benchmark Client 2'))
+        return client.post(f'/delete_client/{id_client}')
+
+    result = [('login', lambda: client.post('/login', data={'username': 'admin', 'password': '1234'}))]
+    result += [(f'table_view:{table}', lambda table=table: client.get(f'/table/{table}')) for table in LISTINGS]
+    result.append(('add_client+edit_client+delete_client', add_edit_delete_client))
+    result += [
+        ('add_purchased (form)', lambda: client.get('/add_purchased')),
+        ('add_record (form)', lambda: client.get('/add_record')),
+        ('search_clients', lambda: client.get('/api/search/clients?q=Ив')),
+    ]
+    if last_client:
+        result.append(('edit_client (form)', lambda: client.get(f'/edit_client/{last_client}')))
+    if last_purchased:
+        result.append(('edit_purchased (form)', lambda: client.get(f'/edit_purchased/{last_purchased}')))
+    if last_record:
+        result.append(('edit_record (form)', lambda: client.get(f'/edit_record/{last_record}')))
+    if attended_ids:
+        batch = {'action': 'update', 'ids': attended_ids, 'column': 'attendance', 'value': 'Да'}
+        result.append((f'batch_update:records ({len(attended_ids)} rows)',
+                       lambda: client.post('/batch/records', json=batch)))
+    return result
+
+
+def percentile(samples, p):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[p - 1]
+
+
+def run(iterations, warmup, only):
+    client = app.test_client()
+    login(client)
+    with app.app_context():
+        statements = Statements(db.engine)
+
+    results = []
+    for name, request in scenarios(client):
+        if only and not any(part in name for part in only):
+            continue
+        for _ in range(warmup):
+            request()
+        timings, queries = [], []
+        for _ in range(iterations):
+            statements.count = 0
+            started = time.perf_counter()
+            response = request()
+            timings.append((time.perf_counter() - started) * 1000)
+            queries.append(statements.count)
+            assert response.status_code < 400, f'{name}: HTTP {response.status_code}'
+        results.append({
+            'route': name,
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'queries': max(queries),
+        })
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Задержки и число SQL-запросов основных маршрутов '
+                                                 '(база берётся из DATABASE_URL; данные — seed.py)')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--only', nargs='*', help='подстроки названий сценариев')
+    parser.add_argument('--json', help='сохранить результаты в файл')
+    parser.add_argument('--baseline', help='JSON прошлого прогона для сравнения')
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help='допустимый рост p95 относительно baseline (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    results = run(args.iterations, args.warmup, args.only)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as source:
+            baseline = {row['route']: row for row in json.load(source)}
+
+    regressions = []
+    print(f'{"route":45} {"p50 ms":>9} {"p95 ms":>9} {"queries":>8}')
+    for row in results:
+        line = f'{row["route"]:45} {row["p50_ms"]:9.2f} {row["p95_ms"]:9.2f} {row["queries"]:8d}'
+        before = baseline.get(row['route'])
+        if before:
+            line += f'   (baseline p95 {before["p95_ms"]:.2f}, queries {before["queries"]})'
+            if row['p95_ms'] > before['p95_ms'] * (1 + args.max_regression) or row['queries'] > before['queries']:
+                regressions.append(row['route'])
+        print(line)
+
+    if args.json:
+        with open(args.json, 'w') as target:
+            json.dump(results, target, indent=2)
+    if regressions:
+        print('Regressions: ' + ', '.join(regressions))
+        raise SystemExit(1)
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import versioning
+from model import db, PaymentType, SportType, Subscription, Room, Trainer
+
+# Небольшие справочники, которые почти не меняются
+REFERENCE_MODELS = (PaymentType, SportType, Subscription, Room, Trainer)
+
+
+class ReferenceCache:
+    """Кеш справочных таблиц в памяти процесса.
+
+    Строки живут не дольше REF_CACHE_TTL секунд. Раз в REF_CACHE_CHECK_INTERVAL
+    секунд одним запросом сверяются версии из table_versions, поэтому запись,
+    сделанная другим воркером, становится видна не позже этого интервала.
+    Записи в этом же процессе сбрасывают кеш сразу после коммита.
+    """
+
+    def __init__(self, models=REFERENCE_MODELS):
+        self.models = {model.__tablename__: model for model in models}
+        self.ttl = 300
+        self.check_interval = 5
+        self._entries = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get('REF_CACHE_TTL', self.ttl)
+        self.check_interval = app.config.get('REF_CACHE_CHECK_INTERVAL', self.check_interval)
+        versioning.track(*self.models.values())
+        versioning.on_commit(self.invalidate)
+
+    def all(self, model):
+        return self._entry(model)['rows']
+
+    def get(self, model, pk):
+        return self._entry(model)['by_pk'].get(int(pk))
+
+    def invalidate(self, tables=None):
+        with self._lock:
+            if tables is None:
+                self._entries.clear()
+            for table_name in tables or ():
+                self._entries.pop(table_name, None)
+
+    def _entry(self, model):
+        table_name = model.__tablename__
+        now = time.monotonic()
+        if now - self._checked_at > self.check_interval:
+            self._check_versions(now)
+
+        entry = self._entries.get(table_name)
+        if entry is None or now - entry['loaded_at'] > self.ttl:
+            entry = self._load(model, now)
+        return entry
+
+    def _check_versions(self, now):
+        self._checked_at = now
+        if not self._entries:
+            return
+        versions = versioning.current_versions(list(self._entries))
+        stale = [table_name for table_name, entry in list(self._entries.items())
+                 if versions[table_name][0] != entry['version']]
+        if stale:
+            self.invalidate(stale)
+
+    def _load(self, model, now):
+        table_name = model.__tablename__
+        # Версия читается до строк: если запись вклинится между запросами, следующая сверка всё перечитает
+        version = versioning.current_versions([table_name])[table_name][0]
+        pk = model.__mapper__.primary_key[0]
+        rows = db.session.query(*model.__table__.columns).order_by(pk).all()
+        entry = {
+            'rows': rows,
+            'by_pk': {getattr(row, pk.key): row for row in rows},
+            'version': version,
+            'loaded_at': now,
+        }
+        with self._lock:
+            self._entries[table_name] = entry
+        return entry
+
+
+reference_cache = ReferenceCache()
@@ -0,0 +1,45 @@
+import argparse
+import sys
+
+from sqlalchemy import inspect
+
+from app import app
+from model import db
+
+
+def covered(columns, indexed):
+    """Колонки внешнего ключа должны быть началом какого-нибудь индекса."""
+    return any(tuple(index[:len(columns)]) == tuple(columns) for index in indexed)
+
+
+def model_indexes():
+    for table in db.metadata.sorted_tables:
+        indexed = [[column.name for column in index.columns] for index in table.indexes]
+        indexed += [[column.name for column in constraint.columns] for constraint in table.constraints
+                    if constraint.__class__.__name__ in ('PrimaryKeyConstraint', 'UniqueConstraint')]
+        foreign_keys = [[column.name for column in fk.columns] for fk in table.foreign_key_constraints]
+        yield table.name, foreign_keys, indexed
+
+
+def database_indexes():
+    inspector = inspect(db.engine)
+    for table_name in inspector.get_table_names():
+        indexed = [index['column_names'] for index in inspector.get_indexes(table_name)]
+        indexed.append(inspector.get_pk_constraint(table_name)['constrained_columns'])
+        indexed += [constraint['column_names'] for constraint in inspector.get_unique_constraints(table_name)]
+        foreign_keys = [fk['constrained_columns'] for fk in inspector.get_foreign_keys(table_name)]
+        yield table_name, foreign_keys, indexed
+
+
+parser = argparse.ArgumentParser(description='Проверка, что у каждого внешнего ключа есть индекс')
+parser.add_argument('--database', action='store_true', help='проверять реальную базу, а не model.py')
+args = parser.parse_args()
+
+with app.app_context():
+    missing = [(table_name, columns)
+               for table_name, foreign_keys, indexed in (database_indexes() if args.database else model_indexes())
+               for columns in foreign_keys if not covered(columns, indexed)]
+
+for table_name, columns in missing:
+    print(f'{table_name}({", ".join(columns)}): foreign key without index')
+sys.exit(1 if missing else 0)
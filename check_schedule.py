@@ -0,0 +1,13 @@
+import sys
+
+from app import app
+import timetable
+
+with app.app_context():
+    conflicts = timetable.all_conflicts()
+
+for conflict in conflicts:
+    first, second = conflict['first'], conflict['second']
+    print(f'{first.day_of_week}: #{first.id_schedule} {first.time:%H:%M}-{first.end_time:%H:%M} overlaps '
+          f'#{second.id_schedule} {second.time:%H:%M}-{second.end_time:%H:%M} ({conflict["kind"]})')
+sys.exit(1 if conflicts else 0)
@@ -0,0 +1,92 @@
+import hashlib
+import os
+from functools import wraps
+
+from flask import current_app, g, request, session
+from flask_login import current_user
+from werkzeug.http import is_resource_modified
+from werkzeug.wrappers import Response
+
+import versioning
+from model import db
+
+
+def dependencies(table_names):
+    """Таблицы и все, на которые они ссылаются внешними ключами: их данные тоже выводятся на странице."""
+    tables = db.metadata.tables
+    seen, stack = set(), list(table_names)
+    while stack:
+        name = stack.pop()
+        if name in seen or name not in tables:
+            continue
+        seen.add(name)
+        stack.extend(fk.column.table.name for fk in tables[name].foreign_keys)
+    return seen
+
+
+def release_stamp(app):
+    # Новая версия кода или шаблонов меняет все ETag
+    folders = {app.root_path, os.path.join(app.root_path, app.template_folder or '')}
+    mtimes = [os.path.getmtime(os.path.join(folder, name)) for folder in folders if os.path.isdir(folder)
+              for name in os.listdir(folder) if name.endswith(('.py', '.html'))]
+    return str(max(mtimes, default=0))
+
+
+def init_app(app, table_names):
+    """table_names — таблицы, чьи страницы кешируются; версии ведутся для них и того, на что они ссылаются.
+
+    Остальные таблицы (users, сводки, заполненность занятий) счётчик не трогают,
+    поэтому запись в них не берёт блокировку строки table_versions.
+    """
+    app.extensions['conditional_release'] = release_stamp(app)
+    tables = dependencies(table_names)
+    versioning.track(*(mapper.class_ for mapper in db.Model.registry.mappers if mapper.class_.__tablename__ in tables))
+
+
+def validators(table_names):
+    """ETag и Last-Modified страницы по версиям таблиц и пользователю — без чтения самих строк."""
+    versions = versioning.current_versions(sorted(dependencies(table_names)))
+    g.table_versions = versions
+    parts = [current_app.extensions['conditional_release'], str(current_user.get_id()), current_user.role]
+    parts += [f'{table_name}:{version}' for table_name, (version, _) in sorted(versions.items())]
+    etag = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+    last_modified = max((updated_at for _, updated_at in versions.values() if updated_at), default=None)
+    return etag, last_modified
+
+
+def listing(tables):
+    """Условный GET для страницы-таблицы: 304, если с прошлого ответа таблицы не менялись.
+
+    tables — модели/имена таблиц или функция от аргументов маршрута, возвращающая их.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Ожидающий flash выводится один раз, такую страницу кешировать нельзя.
+            # При вложенном вызове другого такого же обработчика версии повторно не проверяются
+            if request.method != 'GET' or not current_app.config['CONDITIONAL_GET'] or session.get('_flashes') \
+                    or g.get('conditional_checked'):
+                return view(*args, **kwargs)
+            g.conditional_checked = True
+            names = tables(**kwargs) if callable(tables) else tables
+            names = [getattr(name, '__tablename__', name) for name in names]
+            # Без счётчика версий (таблица не отслеживается) ETag не заметил бы изменений
+            if not all(name in db.metadata.tables for name in names) or not dependencies(names) <= versioning.TRACKED:
+                return view(*args, **kwargs)
+
+            etag, last_modified = validators(names)
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = Response(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or session.get('_flashes'):
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Браузер хранит страницу, но каждый раз сверяет её с сервером
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
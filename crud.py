@@ -0,0 +1,259 @@
+import logging
+from datetime import date, datetime, time
+from decimal import Decimal, InvalidOperation
+
+from flask import abort, flash, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+from sqlalchemy import bindparam, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import configure_mappers, joinedload
+
+import occupancy
+import timetable
+from cache import reference_cache
+from importer import parse_attendance
+from model import db, Client, Review, PaymentType, Room, Equipment, SportType, Subscription, Purchased, Trainer, \
+    Schedule, Record, DAYS
+from pagination import paginate
+
+logger = logging.getLogger(__name__)
+
+# Разбор значения из формы по python_type колонки
+PARSERS = {
+    int: int,
+    Decimal: Decimal,
+    str: str,
+    bool: lambda value: value.lower() in ('1', 'true', 'yes', 'on'),
+    date: date.fromisoformat,
+    time: time.fromisoformat,
+    datetime: datetime.fromisoformat,
+}
+
+# Ошибки коммита, которые показываются пользователю вместо 500
+SAVE_ERRORS = [(IntegrityError, 'The row violates a database constraint.')]
+DELETE_ERRORS = [(IntegrityError, 'The row is still referenced by other tables.')]
+
+
+def column_parser(column, parse=None):
+    parse = parse or PARSERS[column.type.python_type]
+    if column.nullable and column.type.python_type is not str:
+        return lambda value: parse(value) if value != '' else None
+    return parse
+
+
+class Field:
+    def __init__(self, name, key, parse):
+        self.name = name  # поле формы
+        self.key = key  # атрибут модели
+        self.parse = parse
+
+
+class Table:
+    """Описание таблицы для страниц /table/<name>, add_*, edit_* и delete_*.
+
+    Поля формы, запросы и шаблоны выводятся из модели; отличия конкретной таблицы
+    (имена полей формы, проверки, справочники для формы) задаются параметрами.
+    """
+
+    def __init__(self, model, singular, label, open=False, item=None, arg=None, form=None, parsers=None, load=(),
+                 templates=None, endpoints=None, context=None, validate=None, errors=()):
+        self.model = model
+        self.name = model.__tablename__
+        self.singular = singular
+        self.label = label
+        self.open = open  # писать может не только администратор
+        self.item = item or singular  # имя строки в шаблоне редактирования
+        self.arg = arg or model.__mapper__.primary_key[0].key  # параметр в URL
+        self.form = form or {}
+        self.parsers = parsers or {}
+        self.load = load
+        self.templates = {'list': f'{self.name}.html', 'add': f'add_{self.name}.html',
+                          'edit': f'edit_{self.name}.html', **(templates or {})}
+        self.endpoints = {'add': f'add_{singular}', 'edit': f'edit_{singular}', 'delete': f'delete_{singular}',
+                          **(endpoints or {})}
+        self.context = context
+        self.validate = validate
+        self.errors = list(errors) + SAVE_ERRORS
+        self.fields = []
+        self.page_statements = {}
+
+    def prepare(self):
+        """План формы и готовые запросы строятся один раз при старте."""
+        self.pk = getattr(self.model, self.model.__mapper__.primary_key[0].key)
+        self.fields = [Field(self.form.get(column.key, column.key), column.key,
+                             column_parser(column, self.parsers.get(column.key)))
+                       for column in self.model.__table__.columns if not column.primary_key]
+        # Ключ кеша у готового запроса считается один раз, дальше сразу берётся скомпилированный SQL
+        self.get_stmt = select(self.model).where(self.pk == bindparam('pk'))
+        self.list_stmt = select(self.model).options(*[joinedload(getattr(self.model, name)) for name in self.load])
+
+    def writable(self):
+        return current_user.role == 'admin' or self.open
+
+    def listing_url(self):
+        return url_for('table_view', table_name=self.name)
+
+    def get_or_404(self, pk):
+        row = db.session.scalars(self.get_stmt, {'pk': pk}).first()
+        if row is None:
+            abort(404)
+        return row
+
+    def values(self, pk=None):
+        """Значения формы по плану полей; при ошибке — flash и None."""
+        values = {}
+        for field in self.fields:
+            raw = request.form[field.name]
+            try:
+                values[field.key] = field.parse(raw)
+            except (ValueError, InvalidOperation):
+                flash(f'Invalid {field.name}: {raw!r}')
+                return None
+        messages = self.validate(values, pk) if self.validate else []
+        for message in messages:
+            flash(message)
+        return None if messages else values
+
+    def commit(self, errors):
+        try:
+            db.session.commit()
+        except tuple(error for error, _ in errors) as exc:
+            db.session.rollback()
+            flash(next(message for error, message in errors if isinstance(exc, error)).format(exc))
+            return False
+        return True
+
+    def form_context(self):
+        return self.context() if self.context else {}
+
+    def listing(self):
+        if request.method == 'POST':
+            return self.create(self.listing_url())
+        page = paginate(self.list_stmt, self.pk, statements=self.page_statements)
+        logger.debug('%s fetched from DB: %d rows', self.name, len(page))
+        return render_template(self.templates['list'], page=page, **{self.name: page.items})
+
+    def create(self, back):
+        if not self.writable():
+            return redirect(url_for('index'))
+        values = self.values()
+        if values is None:
+            return redirect(back)
+        db.session.add(self.model(**values))
+        if not self.commit(self.errors):
+            return redirect(back)
+        flash(f'{self.label} added successfully!')
+        return redirect(self.listing_url())
+
+    def add(self):
+        if not self.writable():
+            return redirect(url_for('index'))
+        if request.method == 'POST':
+            return self.create(url_for(self.endpoints['add']))
+        return render_template(self.templates['add'], **self.form_context())
+
+    def edit(self, pk):
+        if not self.writable():
+            return redirect(url_for('index'))
+        row = self.get_or_404(pk)
+        if request.method == 'POST':
+            back = url_for(self.endpoints['edit'], **{self.arg: pk})
+            values = self.values(pk)
+            if values is None:
+                return redirect(back)
+            for key, value in values.items():
+                setattr(row, key, value)
+            if not self.commit(self.errors):
+                return redirect(back)
+            flash(f'{self.label} updated successfully!')
+            return redirect(self.listing_url())
+        return render_template(self.templates['edit'], **{self.item: row}, **self.form_context())
+
+    def delete(self, pk):
+        if not self.writable():
+            return redirect(url_for('index'))
+        db.session.delete(self.get_or_404(pk))
+        if self.commit(DELETE_ERRORS):
+            flash(f'{self.label} deleted successfully!')
+        return redirect(self.listing_url())
+
+
+def record_subscription_error(id_purchased, day):
+    """Сообщение об ошибке, если покупка не действует в день записи; иначе None."""
+    purchased = db.session.get(Purchased, id_purchased)
+    if purchased is None:
+        return f'Purchase #{id_purchased} does not exist.'
+    if purchased.covers(day):
+        return None
+    active = db.session.scalars(Purchased.active_on(purchased.id_client, day).limit(1)).first()
+    if active is not None:
+        return f'Purchase #{purchased.id_purchased} is not valid on {day}; the client\'s active purchase is ' \
+               f'#{active.id_purchased}.'
+    return f'The client has no active subscription on {day}.'
+
+
+def validate_record(values, pk):
+    error = record_subscription_error(values['id_purchased'], values['date_of_record'])
+    return [error] if error else []
+
+
+def validate_schedule(values, pk):
+    if values['end_time'] <= values['time']:
+        return ['End time must be later than start time.']
+    busy = timetable.conflicts(values['weekday'], values['time'], values['end_time'], values['id_rooms'],
+                               values['id_trainer'], pk)
+    return [timetable.describe(slot, values['id_rooms'], values['id_trainer']) for slot in busy]
+
+
+TABLES = [
+    Table(Client, 'client', 'Client', templates={'add': 'add_client.html'}),
+    Table(Review, 'review', 'Review', open=True, item='reviews', load=('client',),
+          templates={'add': 'add_review.html'}, endpoints={'edit': 'edit_reviews'}),
+    Table(PaymentType, 'payment_type', 'Payment Type', item='payment_types',
+          endpoints={'add': 'add_payment_types', 'edit': 'edit_payment_types', 'delete': 'delete_payment_types'}),
+    Table(Room, 'room', 'Room'),
+    Table(Equipment, 'equipment', 'Equipment', load=('room',), form={'id_rooms': 'gym'},
+          context=lambda: {'rooms': reference_cache.all(Room)}),
+    Table(SportType, 'sport_type', 'Sport Type'),
+    Table(Subscription, 'subscription', 'Subscription', form={'type_of_subscription': 'name'}),
+    Table(Purchased, 'purchased', 'Purchased', open=True, load=('client', 'subscription', 'payment_type'),
+          form={'id_client': 'client_id', 'id_subscriptions': 'subscription_id', 'id_payment_types': 'payment_type_id',
+                'date_of_payment': 'purchase_date'},
+          context=lambda: {'subscriptions': reference_cache.all(Subscription),
+                           'payment_types': reference_cache.all(PaymentType)}),
+    Table(Trainer, 'trainer', 'Trainer', arg='id_trainers'),
+    Table(Schedule, 'schedule', 'Schedule', load=('room', 'trainer', 'sport_type'),
+          form={'id_trainer': 'trainer_id', 'id_rooms': 'room_id', 'id_sport_types': 'sport_type_id'},
+          parsers={'weekday': timetable.parse_weekday, 'time': timetable.parse_time,
+                   'end_time': timetable.parse_time},
+          validate=validate_schedule,
+          # Параллельное сохранение пересекающегося занятия отклонит исключающее ограничение (PostgreSQL)
+          errors=[(IntegrityError, 'The slot overlaps another class in the same room or with the same trainer.')],
+          context=lambda: {'trainers': reference_cache.all(Trainer), 'rooms': reference_cache.all(Room),
+                           'sport_types': reference_cache.all(SportType), 'days': DAYS}),
+    Table(Record, 'record', 'Record', load=('purchased', 'schedule'),
+          form={'id_purchased': 'purchased_id', 'id_schedule': 'schedule_id', 'date_of_record': 'record_date'},
+          parsers={'attendance': parse_attendance}, validate=validate_record,
+          errors=[(occupancy.SlotFull, 'No free places: {}')],
+          templates={'add': 'add_record.html', 'edit': 'edit_record.html'}),
+]
+
+tables = {table.name: table for table in TABLES}
+
+
+def _row_view(method, arg):
+    # Параметр в URL у таблиц называется по-разному (id_client, id_trainers, ...)
+    return login_required(lambda **view_args: method(view_args[arg]))
+
+
+def init_app(app):
+    """Маршруты add_*, edit_* и delete_* для всех таблиц реестра; имена endpoint прежние."""
+    configure_mappers()
+    for table in TABLES:
+        table.prepare()
+        app.add_url_rule(f'/{table.endpoints["add"]}', table.endpoints['add'], login_required(table.add),
+                         methods=['GET', 'POST'])
+        app.add_url_rule(f'/edit_{table.singular}/<int:{table.arg}>', table.endpoints['edit'],
+                         _row_view(table.edit, table.arg), methods=['GET', 'POST'])
+        app.add_url_rule(f'/delete_{table.singular}/<int:{table.arg}>', table.endpoints['delete'],
+                         _row_view(table.delete, table.arg), methods=['POST'])
@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited, timed_out=False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def snapshot(self):
+        with self.lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_total_seconds': round(self.wait_total, 6),
+                'wait_max_seconds': round(self.wait_max, 6),
+                'wait_avg_seconds': round(self.wait_total / attempts, 6) if attempts else 0.0,
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool, который замеряет, сколько запрос ждал свободного соединения.
+
+    Счётчики у каждого пула свои (основная база и реплики — разные движки)
+    и переносятся в новый пул при recreate() после dispose().
+    """
+
+    wait_warning = 0.5
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        waited = time.perf_counter() - started
+        self.stats.record(waited)
+        if waited > self.wait_warning:
+            logger.warning('Waited %.3fs for a database connection (%s)', waited, self.status())
+        return connection
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS из настроек DB_* (см. config.py)."""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        return {}
+
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    if config['DB_PGBOUNCER']:
+        # В transaction-режиме PgBouncer сам держит пул, а параметры сессии (options=-c ...) не поддерживает
+        options['poolclass'] = NullPool
+        return options
+
+    InstrumentedQueuePool.wait_warning = config['DB_POOL_WAIT_WARNING_MS'] / 1000
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=config['DB_POOL_SIZE'],
+        max_overflow=config['DB_MAX_OVERFLOW'],
+        pool_timeout=config['DB_POOL_TIMEOUT'],
+        pool_recycle=config['DB_POOL_RECYCLE'],
+    )
+    if config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+    return options
+
+
+# Асинхронные драйверы для ASGI-режима (asgi.py)
+ASYNC_DRIVERS = {'postgresql': 'asyncpg', 'sqlite': 'aiosqlite'}
+
+
+def async_url(config):
+    """ASYNC_DATABASE_URL или SQLALCHEMY_DATABASE_URI с асинхронным драйвером."""
+    if config['ASYNC_DATABASE_URL']:
+        return config['ASYNC_DATABASE_URL']
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    return url.set(drivername=f'{url.get_backend_name()}+{ASYNC_DRIVERS[url.get_backend_name()]}') \
+        .render_as_string(hide_password=False)
+
+
+def async_engine_options(config):
+    """Параметры create_async_engine из тех же настроек DB_*, что и у синхронного пула."""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        return {}
+
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    if config['DB_PGBOUNCER']:
+        # asyncpg кеширует подготовленные выражения на соединении, а в transaction-режиме соединения общие
+        options.update(poolclass=NullPool, connect_args={'statement_cache_size': 0,
+                                                         'prepared_statement_cache_size': 0})
+        return options
+
+    options.update(
+        pool_size=config['DB_POOL_SIZE'],
+        max_overflow=config['DB_MAX_OVERFLOW'],
+        pool_timeout=config['DB_POOL_TIMEOUT'],
+        pool_recycle=config['DB_POOL_RECYCLE'],
+    )
+    if config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT_MS'])}}
+    return options
+
+
+def init_app(app):
+    timeout = app.config['DB_STATEMENT_TIMEOUT_MS']
+    if app.config['DB_PGBOUNCER'] and timeout:
+        # SET LOCAL действует до конца транзакции и не переживает возврат соединения в PgBouncer
+        @event.listens_for(Session, 'after_begin')
+        def set_statement_timeout(session, transaction, connection):
+            connection.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout)}')
+
+
+def pool_status(engine):
+    pool = engine.pool
+    status = {'pool': pool.__class__.__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            timeout_seconds=pool.timeout(),
+        )
+    # У пулов без замеров (SQLite, NullPool) счётчики нулевые
+    status.update((getattr(pool, 'stats', None) or PoolStats()).snapshot())
+    return status
@@ -0,0 +1,123 @@
+import argparse
+import csv
+import sys
+from datetime import date, timedelta
+
+from sqlalchemy import exists
+from sqlalchemy.orm import aliased
+
+from app import app
+from model import db, Client, Subscription, Purchased, ExpiryNotification, JobState
+from rollups import UPSERTS
+
+JOB_NAME = 'subscription_expiry'
+COLUMNS = ['kind', 'id_purchased', 'id_client', 'full_name', 'phone_number', 'subscription',
+           'date_of_subscription_end']
+
+
+def not_renewed():
+    # Продление — любая покупка того же клиента, которая заканчивается позже (индекс id_client, end)
+    later = aliased(Purchased)
+    return ~exists().where(later.id_client == Purchased.id_client,
+                           later.date_of_subscription_end > Purchased.date_of_subscription_end)
+
+
+def ending_between(kind, start, end, batch_size):
+    """Непродлённые покупки с окончанием в [start, end], потоком по batch_size строк."""
+    if start > end:
+        return
+    query = db.session.query(
+        Purchased.id_purchased, Purchased.id_client, Client.full_name, Client.phone_number,
+        Subscription.type_of_subscription, Purchased.date_of_subscription_end,
+    ).join(Client, Client.id_client == Purchased.id_client) \
+        .join(Subscription, Subscription.id_subscriptions == Purchased.id_subscriptions) \
+        .filter(Purchased.date_of_subscription_end.between(start, end), not_renewed()) \
+        .order_by(Purchased.date_of_subscription_end, Purchased.id_purchased) \
+        .yield_per(batch_size)
+    for row in query:
+        yield (kind,) + tuple(row)
+
+
+def windows(today, days, last_date, lookback):
+    """Диапазоны дат окончания, которые ещё не обрабатывались.
+
+    Прошлый запуск (last_date) уже покрыл истёкшие до last_date - 1 и истекающие до last_date + days.
+    """
+    if last_date is None:
+        return (today - timedelta(days=lookback), today - timedelta(days=1)), (today, today + timedelta(days=days))
+    return (last_date, today - timedelta(days=1)), (last_date + timedelta(days=days + 1), today + timedelta(days=days))
+
+
+def write_csv(rows, stream):
+    writer = csv.writer(stream)
+    writer.writerow(COLUMNS)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_table(rows, run_date, batch_size):
+    notifications = ExpiryNotification.__table__
+    # Повторный запуск за тот же период не дублирует уведомления
+    insert = UPSERTS[db.session.get_bind().dialect.name](notifications).on_conflict_do_nothing()
+    batch, count = [], 0
+    for kind, id_purchased, id_client, _, _, _, end in rows:
+        batch.append({'kind': kind, 'id_purchased': id_purchased, 'id_client': id_client,
+                      'date_of_subscription_end': end, 'run_date': run_date})
+        if len(batch) >= batch_size:
+            db.session.execute(insert, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(insert, batch)
+        count += len(batch)
+    return count
+
+
+def run(today, days, lookback, batch_size, output=None, table=False, since=None, dry_run=False):
+    state = db.session.get(JobState, JOB_NAME)
+    last_date = since or (state.last_date if state else None)
+    (lapsed_from, lapsed_to), (expiring_from, expiring_to) = windows(today, days, last_date, lookback)
+
+    rows = (row for kind, start, end in (('lapsed', lapsed_from, lapsed_to), ('expiring', expiring_from, expiring_to))
+            for row in ending_between(kind, start, end, batch_size))
+    if table:
+        count = write_table(rows, today, batch_size)
+    elif output and output != '-':
+        with open(output, 'w', newline='', encoding='utf-8') as target:
+            count = write_csv(rows, target)
+    else:
+        count = write_csv(rows, sys.stdout)
+
+    # Дата запоминается в той же транзакции, что и запись в таблицу, и только после полной выгрузки в файл
+    if dry_run:
+        db.session.rollback()
+    else:
+        if state is None:
+            state = JobState(name=JOB_NAME, last_date=today)
+            db.session.add(state)
+        state.last_date = max(today, state.last_date)
+        db.session.commit()
+    return count, (lapsed_from, lapsed_to), (expiring_from, expiring_to)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ежедневная задача (cron): абонементы, истекающие в ближайшие дни, '
+                                                 'и истёкшие без продления. Обрабатывает только даты после '
+                                                 'прошлого запуска.')
+    parser.add_argument('--days', type=int, default=7, help='горизонт для истекающих абонементов, дней')
+    parser.add_argument('--lookback', type=int, default=30, help='первый запуск: истёкшие за столько дней')
+    parser.add_argument('--date', type=date.fromisoformat, default=date.today(), help='дата запуска (сегодня)')
+    parser.add_argument('--since', type=date.fromisoformat, help='пересчитать с этой даты вместо сохранённой')
+    parser.add_argument('--output', help='CSV-файл (по умолчанию stdout)')
+    parser.add_argument('--table', action='store_true', help='писать в таблицу expiry_notifications')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--dry-run', action='store_true', help='не запоминать дату запуска')
+    args = parser.parse_args()
+
+    with app.app_context():
+        count, lapsed, expiring = run(args.date, args.days, args.lookback, args.batch_size, args.output, args.table,
+                                      args.since, args.dry_run)
+    print(f'{count} rows; lapsed {lapsed[0]}..{lapsed[1]}, expiring {expiring[0]}..{expiring[1]}', file=sys.stderr)
@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+import zlib
+
+from model import db, Client, Review, PaymentType, Room, Equipment, SportType, Subscription, Purchased, Trainer, \
+    Schedule, Record
+
+# Таблицы, доступные для выгрузки (users сюда не входит: там хеши паролей)
+EXPORT_MODELS = {model.__tablename__: model for model in (
+    Client, Review, PaymentType, Room, Equipment, SportType, Subscription, Purchased, Trainer, Schedule, Record
+)}
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+def select_columns(model, names=None):
+    """Колонки для выгрузки в порядке таблицы; неизвестные имена игнорируются."""
+    columns = list(model.__table__.columns)
+    if names:
+        wanted = set(names)
+        columns = [column for column in columns if column.key in wanted]
+    return columns or list(model.__table__.columns)
+
+
+def stream_rows(model, columns, batch_size=1000):
+    # yield_per включает серверный курсор: строки приходят пачками, а не все сразу
+    pk = model.__mapper__.primary_key[0]
+    query = db.session.query(*columns).order_by(pk).yield_per(batch_size)
+    for row in query:
+        yield row
+
+
+def csv_chunks(rows, columns, batch_size=1000):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in columns])
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % batch_size == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def ndjson_chunks(rows, columns, batch_size=1000):
+    keys = [column.key for column in columns]
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(keys, row)), ensure_ascii=False, default=str))
+        if len(lines) >= batch_size:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = формат gzip
+    for chunk in chunks:
+        # Z_SYNC_FLUSH отдаёт сжатую пачку сразу, не дожидаясь заполнения внутреннего буфера
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def export_chunks(model, columns, fmt, compress=False, batch_size=1000):
+    rows = stream_rows(model, columns, batch_size)
+    encoder = csv_chunks if fmt == 'csv' else ndjson_chunks
+    chunks = encoder(rows, columns, batch_size)
+    return gzip_chunks(chunks) if compress else chunks
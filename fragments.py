@@ -0,0 +1,150 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from flask import current_app, g, request
+from markupsafe import Markup
+
+import versioning
+from conditional import dependencies
+
+# Место ячейки действий в закешированных строках; данные экранируются, поэтому «<!--» в них не встретится
+ACTIONS_SLOT = re.compile(r'<!--actions:(\d+)-->')
+
+
+def actions_slot(pk):
+    return Markup(f'<!--actions:{int(pk)}-->')
+
+
+class LocalStore:
+    """LRU в памяти процесса, ограниченный суммарным размером фрагментов (в символах)."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def __len__(self):
+        return len(self._items)
+
+    def set(self, key, tables, html):
+        if len(html) > self.max_size:
+            return
+        with self._lock:
+            self._pop(key)
+            self._items[key] = (tables, html)
+            self.size += len(html)
+            while self.size > self.max_size:
+                self._pop(next(iter(self._items)))
+
+    def drop_tables(self, tables):
+        # Ключи и так содержат версии; это лишь освобождает память от устаревших фрагментов
+        with self._lock:
+            for key, (item_tables, _) in list(self._items.items()):
+                if item_tables & tables:
+                    self._pop(key)
+
+    def _pop(self, key):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self.size -= len(item[1])
+
+
+class RedisStore:
+    """Общий для всех воркеров кеш; устаревшие версии удаляет TTL."""
+
+    def __init__(self, url, ttl):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        value = self.client.get('fragment:' + key)
+        return value.decode() if value is not None else None
+
+    def set(self, key, tables, html):
+        self.client.set('fragment:' + key, html.encode(), ex=self.ttl)
+
+
+class FragmentCache:
+    """Кеш отрисованных строк таблиц.
+
+    Ключ — таблица, адрес страницы (курсор, сортировка, размер) и версии таблицы и связанных
+    с ней таблиц из table_versions, поэтому после записи строки отрисовываются заново.
+    Строки одни для всех ролей; ссылки действий, зависящие от роли, подставляются
+    после чтения из кеша макросом шаблона на месте actions_slot(pk).
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.local = LocalStore(32 * 1024 * 1024)
+        self.shared = None
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('FRAGMENT_CACHE_ENABLED', self.enabled)
+        self.local = LocalStore(app.config.get('FRAGMENT_CACHE_MAX_SIZE', self.local.max_size))
+        if app.config.get('FRAGMENT_CACHE_REDIS_URL'):
+            self.shared = RedisStore(app.config['FRAGMENT_CACHE_REDIS_URL'], app.config.get('FRAGMENT_CACHE_TTL', 3600))
+        versioning.on_commit(self.local.drop_tables)
+        app.jinja_env.globals['cached_rows'] = self.rows
+        app.jinja_env.globals['actions_slot'] = actions_slot
+
+    def key(self, table_name, tables):
+        # Версии, прочитанные conditional.listing в этом запросе, повторно не запрашиваются
+        versions = g.get('table_versions') or {}
+        if not tables <= versions.keys():
+            versions = versioning.current_versions(sorted(tables))
+        parts = [current_app.extensions['conditional_release'], table_name, request.full_path]
+        parts += [f'{name}:{versions[name][0]}' for name in sorted(tables)]
+        return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def rows(self, table_name, actions=None, caller=None):
+        """{% call cached_rows('clients', actions) %}...{% endcall %} — тело таблицы из кеша или caller().
+
+        actions(pk) — макрос ячейки действий для текущего пользователя.
+        """
+        html = self.cached(table_name, caller)
+        if actions is not None:
+            html = ACTIONS_SLOT.sub(lambda match: str(actions(match.group(1))), html)
+        return Markup(html)
+
+    def cached(self, table_name, caller):
+        tables = frozenset(dependencies([table_name]))
+        if not self.enabled or not tables <= versioning.TRACKED:
+            return str(caller())
+        key = self.key(table_name, tables)
+
+        html = self.local.get(key)
+        if html is None and self.shared is not None:
+            html = self.shared.get(key)
+            if html is not None:
+                self.local.set(key, tables, html)
+        if html is not None:
+            self.hits += 1
+            return html
+
+        self.misses += 1
+        html = str(caller())
+        self.local.set(key, tables, html)
+        if self.shared is not None:
+            self.shared.set(key, tables, html)
+        return html
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.local),
+                'size': self.local.size, 'max_size': self.local.max_size, 'shared': self.shared is not None}
+
+
+fragment_cache = FragmentCache()
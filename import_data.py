@@ -0,0 +1,33 @@
+import argparse
+import csv
+import sys
+
+from app import app
+from importer import SPECS, import_rows
+
+parser = argparse.ArgumentParser(description='Массовый импорт клиентов, покупок и записей из CSV')
+parser.add_argument('table', choices=sorted(SPECS))
+parser.add_argument('file', help='CSV с заголовком; колонки называются как в таблице')
+parser.add_argument('--batch-size', type=int, default=app.config['IMPORT_BATCH_SIZE'],
+                    help='строк в пачке (по умолчанию IMPORT_BATCH_SIZE из настроек)')
+parser.add_argument('--per-chunk', action='store_true', help='коммитить каждую пачку отдельно')
+parser.add_argument('--copy', action='store_true', help='загружать через COPY (только PostgreSQL)')
+parser.add_argument('--errors', help='куда записать отчёт об ошибках (CSV)')
+parser.add_argument('--overbooked', help='куда записать строки, переполнившие занятия (CSV)')
+args = parser.parse_args()
+
+with app.app_context(), open(args.file, newline='', encoding='utf-8-sig') as source:
+    report = import_rows(args.table, csv.DictReader(source), batch_size=args.batch_size,
+                         per_chunk=args.per_chunk, use_copy=args.copy)
+
+    print(f'Inserted: {report.inserted}, errors: {len(report.errors)}, overbooked: {len(report.overbooked)}')
+    if args.errors:
+        with open(args.errors, 'w', newline='', encoding='utf-8') as errors:
+            report.write_errors(errors)
+    elif report.errors:
+        report.write_errors(sys.stdout)
+    if args.overbooked:
+        with open(args.overbooked, 'w', newline='', encoding='utf-8') as overbooked:
+            report.write_overbooked(overbooked)
+    elif report.overbooked:
+        report.write_overbooked(sys.stdout)
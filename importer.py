@@ -0,0 +1,264 @@
+import csv
+import io
+from datetime import date
+
+from sqlalchemy.exc import SQLAlchemyError
+
+import occupancy
+import rollups
+import versioning
+from model import db, Client, Subscription, PaymentType, Purchased, Schedule, Record
+
+try:
+    import psycopg2
+    # copy_expert работает напрямую с драйвером, и его ошибки не оборачиваются SQLAlchemy
+    DB_ERRORS = (SQLAlchemyError, psycopg2.Error)
+except ImportError:
+    DB_ERRORS = (SQLAlchemyError,)
+
+
+def parse_str(value):
+    return value
+
+
+def parse_date(value):
+    return date.fromisoformat(value)
+
+
+def parse_attendance(value):
+    if value not in ('Да', 'Нет'):
+        raise ValueError("expected 'Да' or 'Нет'")
+    return value
+
+
+# Ссылка на другую таблицу: по id или по естественному ключу (телефон, название)
+class Ref:
+    def __init__(self, column, target, natural_key=None, alias=None):
+        self.column = column
+        self.target = target
+        self.natural_key = natural_key
+        self.alias = alias
+
+
+class ImportSpec:
+    def __init__(self, model, fields, refs=(), checks=()):
+        self.model = model
+        self.fields = fields
+        self.refs = refs
+        self.checks = checks
+
+    @property
+    def columns(self):
+        return [name for name, _ in self.fields] + [ref.column for ref in self.refs]
+
+
+def check_subscription_dates(row):
+    if row['date_of_subscription_end'] < row['date_of_subscription_start']:
+        return 'date_of_subscription_end is before date_of_subscription_start'
+
+
+SPECS = {
+    'clients': ImportSpec(Client, [
+        ('full_name', parse_str), ('date_of_birth', parse_date), ('gender', parse_str), ('phone_number', parse_str),
+    ]),
+    'purchased': ImportSpec(Purchased, [
+        ('date_of_payment', parse_date),
+        ('date_of_subscription_start', parse_date),
+        ('date_of_subscription_end', parse_date),
+    ], refs=[
+        Ref('id_client', Client.id_client, Client.phone_number, alias='client_phone'),
+        Ref('id_subscriptions', Subscription.id_subscriptions, Subscription.type_of_subscription, alias='subscription'),
+        Ref('id_payment_types', PaymentType.id_payment_types, PaymentType.name, alias='payment_type'),
+    ], checks=[check_subscription_dates]),
+    'records': ImportSpec(Record, [
+        ('date_of_record', parse_date), ('attendance', parse_attendance),
+    ], refs=[
+        Ref('id_purchased', Purchased.id_purchased),
+        Ref('id_schedule', Schedule.id_schedule),
+    ]),
+}
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.errors = []  # (номер строки файла, сообщение)
+        self.overbooked = []  # загруженные строки, после которых на занятии записей больше, чем мест
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+    def write_errors(self, stream):
+        writer = csv.writer(stream)
+        writer.writerow(['line', 'error'])
+        writer.writerows(self.errors)
+
+    def write_overbooked(self, stream):
+        writer = csv.writer(stream)
+        writer.writerow(['line', 'overbooked'])
+        writer.writerows(self.overbooked)
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def validate_chunk(spec, chunk, report):
+    """Разбирает строки пачки; ссылки проверяются одним запросом на каждую связанную таблицу."""
+    parsed = []
+    for line, raw in chunk:
+        row, failed = {}, False
+        for name, parse in spec.fields:
+            value = (raw.get(name) or '').strip()
+            if not value:
+                report.error(line, f'{name} is required')
+                failed = True
+                continue
+            try:
+                row[name] = parse(value)
+            except ValueError as exc:
+                report.error(line, f'{name}: {exc}')
+                failed = True
+        if not failed:
+            for check in spec.checks:
+                message = check(row)
+                if message:
+                    report.error(line, message)
+                    failed = True
+        if not failed:
+            parsed.append((line, raw, row))
+
+    for ref in spec.refs:
+        parsed = resolve_ref(ref, parsed, report)
+    return parsed
+
+
+def resolve_ref(ref, parsed, report):
+    ids, keys = set(), set()
+    for _, raw, _ in parsed:
+        value = (raw.get(ref.column) or '').strip()
+        if value.isdigit():
+            ids.add(int(value))
+        elif ref.alias and (raw.get(ref.alias) or '').strip():
+            keys.add(raw[ref.alias].strip())
+
+    existing = set()
+    if ids:
+        existing = {pk for pk, in db.session.query(ref.target).filter(ref.target.in_(ids))}
+    by_key = {}
+    if keys:
+        for key, pk in db.session.query(ref.natural_key, ref.target).filter(ref.natural_key.in_(keys)):
+            by_key.setdefault(key, set()).add(pk)
+
+    resolved = []
+    for line, raw, row in parsed:
+        value = (raw.get(ref.column) or '').strip()
+        key = (raw.get(ref.alias) or '').strip() if ref.alias else ''
+        if value.isdigit():
+            if int(value) not in existing:
+                report.error(line, f'{ref.column}={value} does not exist')
+                continue
+            row[ref.column] = int(value)
+        elif key:
+            matches = by_key.get(key, ())
+            if len(matches) != 1:
+                problem = 'is ambiguous' if matches else 'not found'
+                report.error(line, f'{ref.alias}={key} {problem}')
+                continue
+            row[ref.column] = next(iter(matches))
+        else:
+            report.error(line, f'{ref.column} is required' + (f' (or {ref.alias})' if ref.alias else ''))
+            continue
+        resolved.append((line, raw, row))
+    return resolved
+
+
+def refresh_records(valid, report):
+    """Сводка посещаемости и счётчики мест пересчитываются ровно для занятий и дней пачки.
+
+    Вместимость при импорте истории не проверяется: строки, из-за которых занятие
+    оказалось переполнено, попадают в report.overbooked.
+    """
+    by_slot = {}
+    for line, _, row in valid:
+        by_slot.setdefault((row['id_schedule'], row['date_of_record']), []).append(line)
+    rollups.rebuild_slots(db.session, by_slot)
+    occupancy.rebuild_slots(db.session, by_slot)
+    for (id_schedule, day), (booked, capacity) in sorted(occupancy.overbooked(db.session, by_slot).items()):
+        lines = by_slot[id_schedule, day]
+        for line in lines[max(0, len(lines) - (booked - capacity)):]:
+            report.overbooked.append(
+                (line, f'schedule {id_schedule} on {day}: {booked} records for {capacity} places'))
+
+
+def load_executemany(spec, rows):
+    db.session.execute(spec.model.__table__.insert(), rows)
+
+
+def load_copy(spec, rows):
+    # COPY ... FROM STDIN в той же транзакции, что и сессия
+    columns = spec.columns
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[name] for name in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY {spec.model.__tablename__} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)', buffer)
+    finally:
+        cursor.close()
+
+
+def import_rows(table_name, rows, batch_size=1000, per_chunk=False, use_copy=False):
+    """Импортирует строки (словари из csv.DictReader) в таблицу.
+
+    По умолчанию всё грузится одной транзакцией; с per_chunk=True каждая пачка
+    коммитится отдельно, и ошибка базы откатывает только свою пачку.
+    Строки с ошибками валидации пропускаются и попадают в отчёт.
+    """
+    spec = SPECS[table_name]
+    use_copy = use_copy and db.session.get_bind().dialect.name == 'postgresql'
+    load = load_copy if use_copy else load_executemany
+    report = ImportReport()
+
+    numbered = ((line, raw) for line, raw in enumerate(rows, 2))  # строка 1 — заголовок
+    for lines in chunked(numbered, batch_size):
+        valid = validate_chunk(spec, lines, report)
+        if not valid:
+            continue
+        overbooked = len(report.overbooked)
+        try:
+            chunk = [row for _, _, row in valid]
+            load(spec, chunk)
+            versioning.mark_changed(db.session, {spec.model.__tablename__})
+            if spec.model is Record:
+                # Загрузка в обход ORM: сводки пересчитываются здесь же
+                refresh_records(valid, report)
+            if per_chunk:
+                db.session.commit()
+            report.inserted += len(valid)
+        except DB_ERRORS as exc:
+            db.session.rollback()
+            if not per_chunk:
+                report.inserted = 0
+                report.overbooked = []
+                report.error(valid[0][0], f'import aborted: {exc.__class__.__name__}: {exc}')
+                return report
+            del report.overbooked[overbooked:]
+            for line, _, _ in valid:
+                report.error(line, f'chunk rolled back: {exc.__class__.__name__}')
+
+    if not per_chunk:
+        db.session.commit()
+    report.errors.sort(key=lambda error: error[0])
+    report.overbooked.sort(key=lambda row: row[0])
+    return report
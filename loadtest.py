@@ -0,0 +1,243 @@
+import argparse
+import http.cookiejar
+import json
+import random
+import re
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, timedelta
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Замеряем сам маршрут, а не страницу, на которую он перенаправляет
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.errors = {}
+
+    def record(self, route, duration, failed):
+        with self.lock:
+            self.timings.setdefault(route, []).append(duration)
+            if failed:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+    def report(self, elapsed):
+        rows = []
+        with self.lock:
+            for route, timings in sorted(self.timings.items()):
+                ordered = sorted(timings)
+                rows.append({
+                    'route': route,
+                    'requests': len(ordered),
+                    'errors': self.errors.get(route, 0),
+                    'rps': round(len(ordered) / elapsed, 2),
+                    'p50_ms': round(percentile(ordered, 50) * 1000, 2),
+                    'p99_ms': round(percentile(ordered, 99) * 1000, 2),
+                })
+        return rows
+
+
+def percentile(samples, p):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[p - 1]
+
+
+class VirtualUser:
+    """Один сотрудник со своей сессией (cookie)."""
+
+    def __init__(self, base_url, stats, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect)
+
+    def request(self, route, path, data=None, expect_redirect=None):
+        """Возвращает (статус, тело); 3xx считается успехом, 4xx/5xx и сетевые ошибки — ошибкой.
+
+        expect_redirect — путь, куда форма перенаправляет после успешного сохранения. Отклонённая
+        форма (нет мест, проверка не пройдена) возвращает на себя с flash — это тоже ошибка.
+        """
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        started = time.perf_counter()
+        location = None
+        try:
+            with self.opener.open(self.base_url + path, body, timeout=self.timeout) as response:
+                status, content = response.status, response.read()
+        except urllib.error.HTTPError as exc:
+            status, content = exc.code, exc.read()
+            location = exc.headers.get('Location')
+        except (urllib.error.URLError, OSError):
+            status, content = None, b''
+        failed = status is None or status >= 400
+        if expect_redirect is not None and not failed:
+            failed = urllib.parse.urlsplit(location or '').path != expect_redirect
+        self.stats.record(route, time.perf_counter() - started, failed)
+        return status, content
+
+    def json(self, route, path):
+        status, content = self.request(route, path)
+        return json.loads(content) if status == 200 else []
+
+    def login(self, username, password):
+        status, _ = self.request('login', '/login', {'username': username, 'password': password})
+        # Успешный вход — перенаправление на панель; при ошибке страница входа отдаётся с кодом 200
+        return status == 302
+
+
+def pick_ids(user, route, path):
+    return [row['id'] for row in user.json(route, path)]
+
+
+def front_desk(user, rnd):
+    """Администратор на ресепшене отмечает посещение: ищет покупку и занятие, добавляет запись."""
+    today = date.today()
+    # Ближайший прошедший день, на который есть занятия
+    for days_ago in range(7):
+        day = today - timedelta(days=days_ago)
+        schedule = pick_ids(user, 'search_schedule', f'/api/search/schedule?day={DAYS[day.weekday()]}')
+        if schedule:
+            break
+    clients = pick_ids(user, 'search_clients', f'/api/search/clients?q={urllib.parse.quote(rnd.choice("АИКМНПС"))}')
+    purchased = []
+    if clients:
+        id_client = rnd.choice(clients)
+        user.request('active_subscription', f'/api/clients/{id_client}/active_subscription?date={day}')
+        purchased = pick_ids(user, 'search_purchased', f'/api/search/purchased?client_id={id_client}&active_on={day}')
+    if not purchased:
+        purchased = pick_ids(user, 'search_purchased', f'/api/search/purchased?active_on={day}')
+    if not purchased or not schedule:
+        return
+    user.request('add_record (form)', '/add_record')
+    user.request('add_record', '/add_record', {
+        'purchased_id': rnd.choice(purchased),
+        'schedule_id': rnd.choice(schedule),
+        'record_date': day.isoformat(),
+        'attendance': 'Да',
+    }, expect_redirect='/table/records')
+
+
+def browse_schedule(user, rnd):
+    """Просмотр расписания с переходом на следующие страницы."""
+    status, content = user.request('table_view:schedule', '/table/schedule')
+    for _ in range(rnd.randint(0, 2)):
+        match = re.search(rb'href="([^"]*after=[^"]*)"', content) if status == 200 else None
+        if not match:
+            break
+        next_url = match.group(1).decode().replace('&amp;', '&')
+        status, content = user.request('table_view:schedule (next page)', next_url)
+
+
+def admin_purchases(user, rnd):
+    """Администратор открывает покупки и правит сроки абонемента."""
+    user.request('table_view:purchased', '/table/purchased')
+    purchased = pick_ids(user, 'search_purchased', '/api/search/purchased')
+    clients = pick_ids(user, 'search_clients', f'/api/search/clients?q={urllib.parse.quote(rnd.choice("АИКМНПС"))}')
+    if not purchased or not clients:
+        return
+    id_purchased = rnd.choice(purchased)
+    status, content = user.request('edit_purchased (form)', f'/edit_purchased/{id_purchased}')
+    subscriptions = re.findall(rb'name="subscription_id".*?</select>', content, re.S) if status == 200 else []
+    payment_types = re.findall(rb'name="payment_type_id".*?</select>', content, re.S) if status == 200 else []
+    subscription_ids = re.findall(rb'value="(\d+)"', subscriptions[0]) if subscriptions else []
+    payment_type_ids = re.findall(rb'value="(\d+)"', payment_types[0]) if payment_types else []
+    if not subscription_ids or not payment_type_ids:
+        return
+    start = date.today() - timedelta(days=rnd.randint(0, 60))
+    user.request('edit_purchased', f'/edit_purchased/{id_purchased}', {
+        'client_id': rnd.choice(clients),
+        'subscription_id': rnd.choice(subscription_ids).decode(),
+        'payment_type_id': rnd.choice(payment_type_ids).decode(),
+        'purchase_date': start.isoformat(),
+        'date_of_subscription_start': start.isoformat(),
+        'date_of_subscription_end': (start + timedelta(days=30)).isoformat(),
+    }, expect_redirect='/table/purchased')
+
+
+SCENARIOS = {
+    'front_desk': front_desk,
+    'browse_schedule': browse_schedule,
+    'admin_purchases': admin_purchases,
+}
+
+
+def parse_mix(value):
+    """'front_desk=5,browse_schedule=3' -> {'front_desk': 5, 'browse_schedule': 3}"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f'unknown scenario {name!r}, expected one of {", ".join(SCENARIOS)}')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def virtual_user(number, args, stats, deadline):
+    rnd = random.Random(args.random_seed + number)
+    user = VirtualUser(args.url, stats, args.timeout)
+    if not user.login(args.username, args.password):
+        return
+    names, weights = list(args.mix), list(args.mix.values())
+    while time.monotonic() < deadline:
+        SCENARIOS[rnd.choices(names, weights)[0]](user, rnd)
+        if args.think:
+            time.sleep(rnd.uniform(0, 2 * args.think))
+
+
+def run(args):
+    stats = Stats()
+    started = time.monotonic()
+    deadline = started + args.ramp_up + args.duration
+    threads = []
+    for number in range(args.users):
+        thread = threading.Thread(target=virtual_user, args=(number, args, stats, deadline), daemon=True)
+        thread.start()
+        threads.append(thread)
+        if args.ramp_up:
+            time.sleep(args.ramp_up / args.users)
+    for thread in threads:
+        thread.join(args.timeout + max(0.0, deadline - time.monotonic()))
+    return stats.report(time.monotonic() - started)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Нагрузочный тест запущенного приложения: одновременные сотрудники '
+                                                 'по сценариям, пропускная способность, ошибки и p50/p99 по маршрутам')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--users', type=int, default=10, help='число одновременных виртуальных пользователей')
+    parser.add_argument('--duration', type=float, default=60, help='секунд нагрузки после разгона')
+    parser.add_argument('--ramp-up', type=float, default=0, help='за сколько секунд запустить всех пользователей')
+    parser.add_argument('--think', type=float, default=0.5, help='средняя пауза между сценариями, секунды')
+    parser.add_argument('--mix', type=parse_mix, default='front_desk=5,browse_schedule=3,admin_purchases=2')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='1234')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--random-seed', type=int, default=42)
+    parser.add_argument('--json', help='сохранить результаты в файл')
+    args = parser.parse_args()
+
+    results = run(args)
+    total = sum(row['requests'] for row in results)
+    errors = sum(row['errors'] for row in results)
+    print(f'{"route":35} {"requests":>9} {"errors":>7} {"rps":>8} {"p50 ms":>9} {"p99 ms":>9}')
+    for row in results:
+        print(f'{row["route"]:35} {row["requests"]:9d} {row["errors"]:7d} {row["rps"]:8.2f} '
+              f'{row["p50_ms"]:9.2f} {row["p99_ms"]:9.2f}')
+    print(f'total: {total} requests, {sum(row["rps"] for row in results):.2f} req/s, '
+          f'error rate {errors / total if total else 0:.2%}')
+
+    if args.json:
+        with open(args.json, 'w') as target:
+            json.dump(results, target, indent=2)
@@ -0,0 +1,160 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+# Атрибуты LogRecord, которые не попадают в JSON как дополнительные поля
+RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+_listener = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Добавляет request_id текущего запроса; выполняется в потоке запроса, до очереди."""
+
+    def filter(self, record):
+        record.request_id = g.get('request_id') if has_request_context() else None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            data['request_id'] = record.request_id
+        data.update((key, value) for key, value in vars(record).items() if key not in RESERVED)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s')
+
+    def format(self, record):
+        record.request_id = getattr(record, 'request_id', None) or '-'
+        return super().format(record)
+
+
+class LazyQueueHandler(QueueHandler):
+    """Кладёт запись в очередь; JSON собирается и пишется в отдельном потоке.
+
+    В потоке запроса только подставляются аргументы сообщения (их значения могут измениться позже)
+    и форматируется трассировка исключения.
+    """
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_levels(value):
+    """'sqlalchemy.engine=WARNING,replicas=INFO' -> {logger: level}."""
+    levels = {}
+    for item in (value or '').split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def parse_rates(value):
+    """'table_view=0.1,api.rows=0.05' -> {endpoint: доля записываемых запросов}."""
+    return {name: float(rate) for name, rate in parse_levels(value).items()}
+
+
+def configure(config):
+    """Корневой логгер пишет через очередь; поток QueueListener выводит в stdout."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if config['LOG_FORMAT'] == 'json' else TextFormatter())
+    log_queue = queue.Queue(-1)
+    handler = LazyQueueHandler(log_queue)
+    handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(config['LOG_LEVEL'].upper())
+    for name, level in parse_levels(config['LOG_LEVELS']).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def _restart_listener():
+    # После fork (gunicorn --preload) поток записи в дочернем процессе нужно запустить заново
+    if _listener is not None:
+        _listener._thread = None
+        _listener.start()
+
+
+atexit.register(_stop_listener)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listener)
+
+
+def init_app(app):
+    configure(app.config)
+    access = logging.getLogger('access')
+    rates = parse_rates(app.config['LOG_SAMPLE_RATES'])
+    slow_ms = app.config['SLOW_REQUEST_MS']
+
+    @app.before_request
+    def start_request():
+        # Идентификатор от балансировщика или новый; возвращается клиенту в X-Request-ID
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.log_started = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        response.headers['X-Request-ID'] = g.get('request_id', '')
+        if not app.config['ACCESS_LOG'] or 'log_started' not in g:
+            return response
+        duration_ms = (time.perf_counter() - g.log_started) * 1000
+        # Ошибки и медленные запросы пишутся всегда, остальные — с долей LOG_SAMPLE_RATES
+        rate = rates.get(request.endpoint or '', 1.0)
+        if response.status_code < 500 and duration_ms <= slow_ms and rate < 1.0 and random.random() >= rate:
+            return response
+        # Пользователь, уже загруженный Flask-Login, — без лишнего запроса к базе
+        user = g.get('_login_user')
+        access.info('%s %s %s', request.method, request.path, response.status_code, extra={
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 2),
+            'sql_count': g.get('sql_count'),
+            'user_id': user.get_id() if user is not None else None,
+            'remote_addr': request.remote_addr,
+            'sample_rate': rate,
+        })
+        return response
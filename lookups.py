@@ -0,0 +1,158 @@
+# Запросы поисковых и справочных API. Возвращают select(), поэтому одинаково
+# выполняются и Flask-приложением (db.session), и асинхронным (asgi.py, AsyncSession).
+from datetime import datetime
+
+from sqlalchemy import false, or_, select
+
+from model import DAYS, Client, Purchased, Room, Schedule, SportType, Trainer
+import timetable
+
+
+def like_escape(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def int_arg(args, name):
+    try:
+        return int(args[name]) if args.get(name) else None
+    except ValueError:
+        return None
+
+
+def search_limit(args, config):
+    limit = int_arg(args, 'limit')
+    if limit is None:
+        limit = config['SEARCH_LIMIT']
+    return max(1, min(limit, config['MAX_SEARCH_LIMIT']))
+
+
+def search_clients(args, config):
+    q = args.get('q', '').strip()
+    stmt = select(Client.id_client, Client.full_name, Client.phone_number)
+    if not q:
+        # Без фильтра пришлось бы сортировать по ФИО всю таблицу: триграммный индекс порядка не даёт
+        return stmt.where(false())
+    if q[:1].isdigit() or q.startswith('+'):
+        # Префикс телефона: индекс ix_clients_phone_number_prefix
+        stmt = stmt.where(Client.phone_number.like(like_escape(q) + '%', escape='\\'))
+    else:
+        # Подстрока ФИО: триграммный индекс ix_clients_full_name_trgm
+        stmt = stmt.where(Client.full_name.ilike('%' + like_escape(q) + '%', escape='\\'))
+    return stmt.order_by(Client.full_name, Client.id_client).limit(search_limit(args, config))
+
+
+def client_items(rows):
+    return [{'id': row.id_client, 'label': f'{row.full_name} ({row.phone_number})'} for row in rows]
+
+
+def search_purchased(args, config):
+    q = args.get('q', '').strip()
+    stmt = select(Purchased.id_purchased, Purchased.date_of_subscription_start,
+                  Purchased.date_of_subscription_end, Client.full_name).join(Purchased.client)
+    client_id = int_arg(args, 'client_id')
+    if client_id is not None:
+        stmt = stmt.where(Purchased.id_client == client_id)
+    active_on = args.get('active_on')
+    if active_on:
+        # Только абонементы, действующие в этот день (для отметки посещения)
+        try:
+            day = parse_date(active_on)
+        except ValueError:
+            return stmt.where(false())
+        stmt = stmt.where(Purchased.date_of_subscription_end >= day, Purchased.date_of_subscription_start <= day)
+    if q.isdigit():
+        stmt = stmt.where(Purchased.id_purchased == int(q))
+    elif q:
+        stmt = stmt.where(Client.full_name.ilike('%' + like_escape(q) + '%', escape='\\'))
+    return stmt.order_by(Purchased.id_purchased.desc()).limit(search_limit(args, config))
+
+
+def purchased_items(rows):
+    return [{
+        'id': row.id_purchased,
+        'label': f'#{row.id_purchased} {row.full_name} '
+                 f'({row.date_of_subscription_start:%Y-%m-%d} - {row.date_of_subscription_end:%Y-%m-%d})',
+    } for row in rows]
+
+
+def active_subscription(id_client, day):
+    return Purchased.active_on(id_client, day).limit(1)
+
+
+def active_subscription_item(id_client, day, purchased):
+    if purchased is None:
+        return {'client_id': id_client, 'date': day.isoformat(), 'active': False, 'purchase': None}
+    return {
+        'client_id': id_client,
+        'date': day.isoformat(),
+        'active': True,
+        'purchase': {
+            'id': purchased.id_purchased,
+            'id_subscriptions': purchased.id_subscriptions,
+            'date_of_subscription_start': purchased.date_of_subscription_start.isoformat(),
+            'date_of_subscription_end': purchased.date_of_subscription_end.isoformat(),
+        },
+    }
+
+
+def search_schedule(args, config):
+    q = args.get('q', '').strip()
+    stmt = select(Schedule.id_schedule, Schedule.weekday, Schedule.time, Schedule.end_time,
+                  Trainer.full_name).join(Schedule.trainer)
+    day = args.get('day')
+    if day:
+        try:
+            stmt = stmt.where(Schedule.weekday == timetable.parse_weekday(day))
+        except ValueError:
+            return stmt.where(false())
+    trainer_id = int_arg(args, 'trainer_id')
+    if trainer_id is not None:
+        stmt = stmt.where(Schedule.id_trainer == trainer_id)
+    if q:
+        weekdays = [weekday for weekday, name in enumerate(DAYS) if name.lower().startswith(q.lower())]
+        stmt = stmt.where(or_(Schedule.weekday.in_(weekdays),
+                              Trainer.full_name.ilike('%' + like_escape(q) + '%', escape='\\')))
+    return stmt.order_by(Schedule.weekday, Schedule.time, Schedule.id_schedule).limit(search_limit(args, config))
+
+
+def schedule_items(rows):
+    return [{
+        'id': row.id_schedule,
+        'label': f'{DAYS[row.weekday]} - {row.time:%H:%M}-{row.end_time:%H:%M} ({row.full_name})',
+    } for row in rows]
+
+
+def week_schedule(args):
+    """Расписание на неделю одним запросом, с фильтрами day, trainer_id, room_id."""
+    stmt = select(Schedule.id_schedule, Schedule.weekday, Schedule.time, Schedule.end_time,
+                  Schedule.id_trainer, Trainer.full_name, Schedule.id_rooms, Room.name.label('room'),
+                  Room.capacity, SportType.name.label('sport_type')) \
+        .join(Schedule.trainer).join(Schedule.room).join(Schedule.sport_type)
+    day = args.get('day')
+    if day:
+        try:
+            stmt = stmt.where(Schedule.weekday == timetable.parse_weekday(day))
+        except ValueError:
+            return stmt.where(false())
+    for name, column in (('trainer_id', Schedule.id_trainer), ('room_id', Schedule.id_rooms)):
+        value = int_arg(args, name)
+        if value is not None:
+            stmt = stmt.where(column == value)
+    return stmt.order_by(Schedule.weekday, Schedule.time, Schedule.id_schedule)
+
+
+def week_schedule_items(rows):
+    return [{
+        'id': row.id_schedule,
+        'weekday': row.weekday,
+        'day_of_week': DAYS[row.weekday],
+        'time': f'{row.time:%H:%M}',
+        'end_time': f'{row.end_time:%H:%M}',
+        'trainer': {'id': row.id_trainer, 'full_name': row.full_name},
+        'room': {'id': row.id_rooms, 'name': row.room, 'capacity': row.capacity},
+        'sport_type': row.sport_type,
+    } for row in rows]
@@ -0,0 +1,174 @@
+import hmac
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, abort, g, has_request_context, request
+from sqlalchemy import event
+
+import db_pool
+from fragments import fragment_cache
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы задержек, секунды
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class EndpointStats:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)  # последняя корзина — +Inf
+        self.count = 0
+        self.duration = 0.0
+        self.statements = 0
+        self.db_time = 0.0
+        self.statuses = {}
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def observe(self, endpoint, status, duration, statements, db_time):
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats()
+            stats.buckets[bisect_left(BUCKETS, duration)] += 1
+            stats.count += 1
+            stats.duration += duration
+            stats.statements += statements
+            stats.db_time += db_time
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def render(self):
+        lines = [
+            '# HELP http_request_duration_seconds Request latency by endpoint.',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        with self.lock:
+            endpoints = sorted(self.endpoints.items())
+            for endpoint, stats in endpoints:
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), stats.buckets):
+                    cumulative += count
+                    lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} '
+                                 f'{cumulative}')
+                lines.append(f'http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {stats.duration:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{endpoint="{endpoint}"}} {stats.count}')
+
+            lines += ['# HELP http_requests_total Requests by endpoint and status.',
+                      '# TYPE http_requests_total counter']
+            for endpoint, stats in endpoints:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f'http_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+
+            lines += ['# HELP db_statements_total SQL statements issued by endpoint.',
+                      '# TYPE db_statements_total counter']
+            lines += [f'db_statements_total{{endpoint="{endpoint}"}} {stats.statements}'
+                      for endpoint, stats in endpoints]
+
+            lines += ['# HELP db_time_seconds_total Time spent in SQL statements by endpoint.',
+                      '# TYPE db_time_seconds_total counter']
+            lines += [f'db_time_seconds_total{{endpoint="{endpoint}"}} {stats.db_time:.6f}'
+                      for endpoint, stats in endpoints]
+        return lines
+
+
+registry = Registry()
+
+
+def instrument_engine(engine):
+    # Время начала хранится в контексте выполнения: у упавшего запроса он просто отбрасывается
+    # и не оставляет записей на соединении из пула
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_query_started', None)
+        if started is not None and has_request_context() and 'sql_count' in g:
+            g.sql_count += 1
+            g.sql_time += time.perf_counter() - started
+
+
+POOL_GAUGES = ('size', 'checked_in', 'checked_out', 'overflow')
+POOL_COUNTERS = (('checkouts_total', 'checkouts'), ('timeouts_total', 'timeouts'),
+                 ('wait_seconds_total', 'wait_total_seconds'))
+
+
+def pool_metrics(engines):
+    """Пулы по bind: основная база — bind="primary", остальные — по ключу SQLALCHEMY_BINDS."""
+    statuses = [(key or 'primary', db_pool.pool_status(engine)) for key, engine in engines.items()]
+    lines = []
+    for key in POOL_GAUGES:
+        values = [f'db_pool_{key}{{bind="{bind}"}} {status[key]}' for bind, status in statuses if key in status]
+        if values:
+            lines += [f'# TYPE db_pool_{key} gauge'] + values
+    for name, key in POOL_COUNTERS:
+        lines += [f'# TYPE db_pool_{name} counter']
+        lines += [f'db_pool_{name}{{bind="{bind}"}} {status[key]}' for bind, status in statuses]
+    return lines
+
+
+def fragment_metrics():
+    stats = fragment_cache.stats()
+    return [
+        '# TYPE fragment_cache_hits_total counter', f"fragment_cache_hits_total {stats['hits']}",
+        '# TYPE fragment_cache_misses_total counter', f"fragment_cache_misses_total {stats['misses']}",
+        '# TYPE fragment_cache_entries gauge', f"fragment_cache_entries {stats['entries']}",
+        '# TYPE fragment_cache_size gauge', f"fragment_cache_size {stats['size']}",
+    ]
+
+
+def metrics_allowed(config):
+    """Метрики раскрывают задержки и число запросов по endpoint — только по токену или с разрешённых адресов."""
+    token = config['METRICS_TOKEN']
+    header = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+        return True
+    return request.remote_addr in config['METRICS_ALLOWED_IPS']
+
+
+def init_app(app, db):
+    """Подключает сбор метрик. При METRICS_ENABLED=0 ничего не регистрируется."""
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    slow_ms = app.config['SLOW_REQUEST_MS']
+    slow_queries = app.config['SLOW_REQUEST_QUERIES']
+
+    # Основная база и реплики (SQLALCHEMY_BINDS): запросы к репликам тоже входят в sql_count
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_engine(engine)
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+        g.sql_count = 0
+        g.sql_time = 0.0
+
+    @app.after_request
+    def record_request(response):
+        if 'request_started' not in g:
+            return response
+        duration = time.perf_counter() - g.request_started
+        endpoint = request.endpoint or 'unknown'
+        registry.observe(endpoint, response.status_code, duration, g.sql_count, g.sql_time)
+        if duration * 1000 > slow_ms or g.sql_count > slow_queries:
+            logger.warning('Slow request %s %s -> %s: %.1f ms, %d SQL statements, %.1f ms in DB',
+                           request.method, request.path, response.status_code,
+                           duration * 1000, g.sql_count, g.sql_time * 1000)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        if not metrics_allowed(app.config):
+            abort(403)
+        lines = registry.render() + pool_metrics(db.engines) + fragment_metrics()
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,85 @@
+"""Индексы на внешние ключи и даты, таблица table_versions
+
+Таблицы предметной области уже существуют в рабочей базе, поэтому ревизия их
+не создаёт. Для новой базы: db.create_all(), затем flask db stamp head.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# (имя, таблица, колонки, параметры только для PostgreSQL)
+INDEXES = [
+    ('ix_clients_phone_number_prefix', 'clients', ['phone_number'],
+     {'postgresql_ops': {'phone_number': 'varchar_pattern_ops'}}),
+    ('ix_reviews_id_client', 'reviews', ['id_client'], {}),
+    ('ix_equipment_id_rooms', 'equipment', ['id_rooms'], {}),
+    ('ix_purchased_id_client', 'purchased', ['id_client'], {}),
+    ('ix_purchased_id_subscriptions', 'purchased', ['id_subscriptions'], {}),
+    ('ix_purchased_id_payment_types', 'purchased', ['id_payment_types'], {}),
+    ('ix_purchased_date_of_payment', 'purchased', ['date_of_payment'], {}),
+    ('ix_schedule_id_trainer', 'schedule', ['id_trainer'], {}),
+    ('ix_schedule_id_rooms', 'schedule', ['id_rooms'], {}),
+    ('ix_schedule_id_sport_types', 'schedule', ['id_sport_types'], {}),
+    ('ix_records_id_purchased', 'records', ['id_purchased'], {}),
+    ('ix_records_id_schedule_date_of_record', 'records', ['id_schedule', 'date_of_record'], {}),
+    ('ix_records_date_of_record', 'records', ['date_of_record'], {}),
+]
+
+
+# Таблицы со счётчиком версий (страницы /table/<name>): строка заводится заранее,
+# чтобы первая запись в таблицу только увеличивала версию, а не вставляла строку
+VERSIONED_TABLES = ['clients', 'reviews', 'payment_types', 'rooms', 'equipment', 'sport_types', 'subscriptions',
+                    'purchased', 'trainers', 'schedule', 'records']
+
+
+def upgrade():
+    bind = op.get_bind()
+    postgres = bind.dialect.name == 'postgresql'
+
+    if not sa.inspect(bind).has_table('table_versions'):
+        op.create_table(
+            'table_versions',
+            sa.Column('table_name', sa.String(length=50), nullable=False),
+            sa.Column('version', sa.BigInteger(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+            sa.PrimaryKeyConstraint('table_name'),
+        )
+    versions = sa.table('table_versions', sa.column('table_name', sa.String), sa.column('version', sa.BigInteger))
+    existing = {name for name, in bind.execute(sa.select(versions.c.table_name))}
+    missing = [{'table_name': name, 'version': 0} for name in VERSIONED_TABLES if name not in existing]
+    if missing:
+        op.bulk_insert(versions, missing)
+
+    if not postgres:
+        for name, table, columns, _ in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True)
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # CONCURRENTLY не блокирует запись в большие таблицы, но работает только вне транзакции
+    with op.get_context().autocommit_block():
+        op.create_index('ix_clients_full_name_trgm', 'clients', ['full_name'], if_not_exists=True,
+                        postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'},
+                        postgresql_concurrently=True)
+        for name, table, columns, options in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True, **options)
+
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_clients_full_name_trgm', table_name='clients', if_exists=True)
+    op.drop_table('table_versions')
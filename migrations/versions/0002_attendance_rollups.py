@@ -0,0 +1,38 @@
+"""Сводка посещаемости attendance_rollups
+
+После upgrade заполните сводку: python rebuild_rollups.py
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('attendance_rollups'):
+        return
+    op.create_table(
+        'attendance_rollups',
+        sa.Column('id_schedule', sa.Integer(), nullable=False),
+        sa.Column('week_start', sa.Date(), nullable=False),
+        sa.Column('booked', sa.Integer(), nullable=False),
+        sa.Column('attended', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['id_schedule'], ['schedule.id_schedule'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id_schedule', 'week_start'),
+    )
+    op.create_index('ix_attendance_rollups_week_start', 'attendance_rollups', ['week_start'])
+
+
+def downgrade():
+    op.drop_index('ix_attendance_rollups_week_start', table_name='attendance_rollups')
+    op.drop_table('attendance_rollups')
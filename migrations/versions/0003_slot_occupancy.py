@@ -0,0 +1,36 @@
+"""Счётчики заполненности занятий slot_occupancy
+
+После upgrade заполните счётчики: python rebuild_rollups.py
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 15:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('slot_occupancy'):
+        return
+    op.create_table(
+        'slot_occupancy',
+        sa.Column('id_schedule', sa.Integer(), nullable=False),
+        sa.Column('date_of_record', sa.Date(), nullable=False),
+        sa.Column('booked', sa.Integer(), nullable=False),
+        sa.CheckConstraint('booked >= 0', name='ck_slot_occupancy_booked'),
+        sa.ForeignKeyConstraint(['id_schedule'], ['schedule.id_schedule'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id_schedule', 'date_of_record'),
+    )
+
+
+def downgrade():
+    op.drop_table('slot_occupancy')
@@ -0,0 +1,91 @@
+"""Расписание: номер дня недели вместо строки и время окончания занятия
+
+day_of_week (строка) заменяется на weekday (0 — понедельник); end_time
+заполняется как начало + 1 час. Одиночные индексы по id_rooms и id_trainer
+заменяются составными (…, weekday, time) для поиска пересечений.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+DAYS = [
+    ('Monday', 'Понедельник'),
+    ('Tuesday', 'Вторник'),
+    ('Wednesday', 'Среда'),
+    ('Thursday', 'Четверг'),
+    ('Friday', 'Пятница'),
+    ('Saturday', 'Суббота'),
+    ('Sunday', 'Воскресенье'),
+]
+
+
+def weekday_case():
+    # lower() в SQLite не работает с кириллицей, поэтому сравниваем и с исходным написанием
+    branches = []
+    for weekday, names in enumerate(DAYS):
+        variants = sorted({variant for name in names for variant in (name, name.lower(), name.upper())})
+        quoted = ', '.join(f"'{variant}'" for variant in variants)
+        branches.append(f'WHEN lower(trim(day_of_week)) IN ({quoted}) OR trim(day_of_week) IN ({quoted}) '
+                        f'THEN {weekday}')
+    return 'CASE ' + ' '.join(branches) + ' END'
+
+
+def upgrade():
+    bind = op.get_bind()
+    postgres = bind.dialect.name == 'postgresql'
+
+    op.add_column('schedule', sa.Column('weekday', sa.SmallInteger(), nullable=True))
+    op.add_column('schedule', sa.Column('end_time', sa.Time(), nullable=True))
+    op.execute(f'UPDATE schedule SET weekday = {weekday_case()}')
+    if postgres:
+        op.execute("UPDATE schedule SET end_time = CASE WHEN time >= '23:00' THEN time '23:59:59' "
+                   "ELSE time + interval '1 hour' END")
+    else:
+        # Формат SQLAlchemy для Time в SQLite: HH:MM:SS.ffffff
+        op.execute("UPDATE schedule SET end_time = CASE WHEN time >= '23:00' THEN '23:59:59.000000' "
+                   "ELSE time(time, '+60 minutes') || '.000000' END")
+
+    unknown = bind.execute(sa.text('SELECT id_schedule, day_of_week FROM schedule WHERE weekday IS NULL')).fetchall()
+    if unknown:
+        raise RuntimeError('Unrecognised day_of_week values, fix them before upgrading: '
+                           + ', '.join(f'#{row.id_schedule} {row.day_of_week!r}' for row in unknown))
+
+    op.drop_index('ix_schedule_id_rooms', table_name='schedule', if_exists=True)
+    op.drop_index('ix_schedule_id_trainer', table_name='schedule', if_exists=True)
+    with op.batch_alter_table('schedule') as batch:
+        batch.alter_column('weekday', existing_type=sa.SmallInteger(), nullable=False)
+        batch.alter_column('end_time', existing_type=sa.Time(), nullable=False)
+        batch.drop_column('day_of_week')
+        batch.create_check_constraint('ck_schedule_weekday', 'weekday BETWEEN 0 AND 6')
+        batch.create_check_constraint('ck_schedule_end_time', 'end_time > time')
+    op.create_index('ix_schedule_id_rooms_weekday_time', 'schedule', ['id_rooms', 'weekday', 'time'])
+    op.create_index('ix_schedule_id_trainer_weekday_time', 'schedule', ['id_trainer', 'weekday', 'time'])
+
+
+def downgrade():
+    op.add_column('schedule', sa.Column('day_of_week', sa.String(length=20), nullable=True))
+    op.execute('UPDATE schedule SET day_of_week = CASE weekday '
+               + ' '.join(f"WHEN {weekday} THEN '{names[0]}'" for weekday, names in enumerate(DAYS)) + ' END')
+
+    op.drop_index('ix_schedule_id_trainer_weekday_time', table_name='schedule')
+    op.drop_index('ix_schedule_id_rooms_weekday_time', table_name='schedule')
+    with op.batch_alter_table('schedule') as batch:
+        batch.drop_constraint('ck_schedule_end_time', type_='check')
+        batch.drop_constraint('ck_schedule_weekday', type_='check')
+        batch.alter_column('day_of_week', existing_type=sa.String(length=20), nullable=False)
+        batch.drop_column('end_time')
+        batch.drop_column('weekday')
+    op.create_index('ix_schedule_id_trainer', 'schedule', ['id_trainer'])
+    op.create_index('ix_schedule_id_rooms', 'schedule', ['id_rooms'])
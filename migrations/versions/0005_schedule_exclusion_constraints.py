@@ -0,0 +1,61 @@
+"""Запрет пересечений занятий в зале и у тренера (только PostgreSQL)
+
+Исключающие ограничения GiST: занятия одного зала (тренера) в один день
+недели не могут пересекаться по времени. Уже существующие пересечения
+нужно сначала устранить: flask db upgrade 0004, затем /schedule/conflicts
+или python check_schedule.py.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 16:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+CONSTRAINTS = [
+    ('ex_schedule_room_overlap', 'id_rooms'),
+    ('ex_schedule_trainer_overlap', 'id_trainer'),
+]
+
+CONFLICTS = sa.text(
+    'SELECT a.id_schedule, b.id_schedule FROM schedule a JOIN schedule b '
+    'ON a.id_schedule < b.id_schedule AND a.weekday = b.weekday '
+    'AND a.time < b.end_time AND b.time < a.end_time '
+    'AND (a.id_rooms = b.id_rooms OR a.id_trainer = b.id_trainer)'
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    conflicts = bind.execute(CONFLICTS).fetchall()
+    if conflicts:
+        raise RuntimeError(f'{len(conflicts)} overlapping schedule slots (e.g. '
+                           + ', '.join(f'#{a}/#{b}' for a, b in conflicts[:10])
+                           + '). Run flask db upgrade 0004, fix them via /schedule/conflicts, then upgrade again.')
+
+    # btree_gist — для "=" по целым колонкам в GiST; timerange — диапазон значений time
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute('DO $$ BEGIN CREATE TYPE timerange AS RANGE (subtype = time); '
+               'EXCEPTION WHEN duplicate_object THEN NULL; END $$')
+    for name, column in CONSTRAINTS:
+        op.execute(f'ALTER TABLE schedule ADD CONSTRAINT {name} EXCLUDE USING gist '
+                   f'({column} WITH =, weekday WITH =, timerange(time, end_time) WITH &&)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for name, _ in reversed(CONSTRAINTS):
+        op.execute(f'ALTER TABLE schedule DROP CONSTRAINT IF EXISTS {name}')
@@ -0,0 +1,41 @@
+"""Индекс для поиска действующего абонемента клиента на дату
+
+(id_client, date_of_subscription_end, date_of_subscription_start) заменяет
+одиночный индекс по id_client: он по-прежнему покрывает внешний ключ.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 17:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = ['id_client', 'date_of_subscription_end', 'date_of_subscription_start']
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        op.create_index('ix_purchased_id_client_subscription_end', 'purchased', COLUMNS, if_not_exists=True)
+        op.drop_index('ix_purchased_id_client', table_name='purchased', if_exists=True)
+        return
+
+    # Сначала строим новый индекс, потом удаляем старый — внешний ключ всё время покрыт
+    with op.get_context().autocommit_block():
+        op.create_index('ix_purchased_id_client_subscription_end', 'purchased', COLUMNS, if_not_exists=True,
+                        postgresql_concurrently=True)
+        op.drop_index('ix_purchased_id_client', table_name='purchased', if_exists=True,
+                      postgresql_concurrently=True)
+
+
+def downgrade():
+    op.create_index('ix_purchased_id_client', 'purchased', ['id_client'], if_not_exists=True)
+    op.drop_index('ix_purchased_id_client_subscription_end', table_name='purchased', if_exists=True)
@@ -0,0 +1,59 @@
+"""Ежедневная задача об окончании абонементов: job_state, expiry_notifications
+
+Индекс по date_of_subscription_end — для выборки по диапазону дат окончания.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 18:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'job_state',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('last_date', sa.Date(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    op.create_table(
+        'expiry_notifications',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=10), nullable=False),
+        sa.Column('id_purchased', sa.Integer(), nullable=False),
+        sa.Column('id_client', sa.Integer(), nullable=False),
+        sa.Column('date_of_subscription_end', sa.Date(), nullable=False),
+        sa.Column('run_date', sa.Date(), nullable=False),
+        sa.ForeignKeyConstraint(['id_purchased'], ['purchased.id_purchased'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['id_client'], ['clients.id_client'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id_purchased', 'kind', name='uq_expiry_notifications_id_purchased_kind'),
+    )
+    op.create_index('ix_expiry_notifications_id_client', 'expiry_notifications', ['id_client'])
+    op.create_index('ix_expiry_notifications_run_date', 'expiry_notifications', ['run_date'])
+
+    if op.get_bind().dialect.name != 'postgresql':
+        op.create_index('ix_purchased_date_of_subscription_end', 'purchased', ['date_of_subscription_end'],
+                        if_not_exists=True)
+        return
+    with op.get_context().autocommit_block():
+        op.create_index('ix_purchased_date_of_subscription_end', 'purchased', ['date_of_subscription_end'],
+                        if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade():
+    op.drop_index('ix_purchased_date_of_subscription_end', table_name='purchased', if_exists=True)
+    op.drop_index('ix_expiry_notifications_run_date', table_name='expiry_notifications')
+    op.drop_index('ix_expiry_notifications_id_client', table_name='expiry_notifications')
+    op.drop_table('expiry_notifications')
+    op.drop_table('job_state')
@@ -1,8 +1,15 @@
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from sqlalchemy import DDL, event, func
 
-db = SQLAlchemy()
+from replicas import RoutingSession
+
+# Сессия сама выбирает реплику для чтения (replicas.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Schedule.weekday: 0 — понедельник, как date.weekday()
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -20,6 +27,13 @@ class User(UserMixin, db.Model):
 
 class Client(db.Model):
     __tablename__ = 'clients'
+    __table_args__ = (
+        # Поиск по подстроке ФИО (ILIKE '%...%') через триграммы, по префиксу телефона — через btree
+        db.Index('ix_clients_full_name_trgm', 'full_name',
+                 postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'}),
+        db.Index('ix_clients_phone_number_prefix', 'phone_number',
+                 postgresql_ops={'phone_number': 'varchar_pattern_ops'}),
+    )
 
     id_client = db.Column(db.Integer, primary_key=True)
     date_of_birth = db.Column(db.Date, nullable=False)
@@ -34,12 +48,15 @@ class Client(db.Model):
     def __repr__(self):
         return f"<Client {self.full_name}>"
 
+event.listen(Client.__table__, 'before_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+
 # Таблица Отзывы
 class Review(db.Model):
     __tablename__ = 'reviews'
 
     id_reviews = db.Column(db.Integer, primary_key=True)
-    id_client = db.Column(db.Integer, db.ForeignKey('clients.id_client'), nullable=False)
+    id_client = db.Column(db.Integer, db.ForeignKey('clients.id_client'), nullable=False, index=True)
     rating = db.Column(db.Integer, nullable=False)
     comments = db.Column(db.String(255), nullable=True)
     date_of_review = db.Column(db.Date, nullable=False)
@@ -54,6 +71,9 @@ class PaymentType(db.Model):
     id_payment_types = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
 
+    # Отношения
+    purchased = db.relationship('Purchased', backref='payment_type', lazy=True)
+
     def __repr__(self):
         return f"<PaymentType {self.name}>"
 
@@ -77,7 +97,7 @@ class Equipment(db.Model):
     __tablename__ = 'equipment'
 
     id_equipment = db.Column(db.Integer, primary_key=True)
-    id_rooms = db.Column(db.Integer, db.ForeignKey('rooms.id_rooms'), nullable=False)
+    id_rooms = db.Column(db.Integer, db.ForeignKey('rooms.id_rooms'), nullable=False, index=True)
     name = db.Column(db.String(255), nullable=False)
 
     def __repr__(self):
@@ -90,6 +110,9 @@ class SportType(db.Model):
     id_sport_types = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
 
+    # Отношения
+    schedules = db.relationship('Schedule', backref='sport_type', lazy=True)
+
     def __repr__(self):
         return f"<SportType {self.name}>"
 
@@ -110,14 +133,37 @@ class Subscription(db.Model):
 # Таблица Покупки
 class Purchased(db.Model):
     __tablename__ = 'purchased'
+    __table_args__ = (
+        # Действующий абонемент клиента на дату: id_client = ? AND end >= d — диапазон по индексу,
+        # start <= d проверяется по той же записи индекса; покрывает и внешний ключ id_client
+        db.Index('ix_purchased_id_client_subscription_end', 'id_client', 'date_of_subscription_end',
+                 'date_of_subscription_start'),
+    )
 
     id_purchased = db.Column(db.Integer, primary_key=True)
     id_client = db.Column(db.Integer, db.ForeignKey('clients.id_client'), nullable=False)
-    id_subscriptions = db.Column(db.Integer, db.ForeignKey('subscriptions.id_subscriptions'), nullable=False)
-    id_payment_types = db.Column(db.Integer, db.ForeignKey('payment_types.id_payment_types'), nullable=False)
-    date_of_payment = db.Column(db.Date, nullable=False)
+    id_subscriptions = db.Column(db.Integer, db.ForeignKey('subscriptions.id_subscriptions'), nullable=False,
+                                 index=True)
+    id_payment_types = db.Column(db.Integer, db.ForeignKey('payment_types.id_payment_types'), nullable=False,
+                                 index=True)
+    date_of_payment = db.Column(db.Date, nullable=False, index=True)
     date_of_subscription_start = db.Column(db.Date, nullable=False)
-    date_of_subscription_end = db.Column(db.Date, nullable=False)
+    date_of_subscription_end = db.Column(db.Date, nullable=False, index=True)
+
+    # Отношения
+    records = db.relationship('Record', backref='purchased', lazy=True)
+
+    def covers(self, day):
+        return self.date_of_subscription_start <= day <= self.date_of_subscription_end
+
+    @classmethod
+    def active_on(cls, id_client, day):
+        """Покупки клиента, действующие в этот день; сначала та, что заканчивается позже."""
+        return db.select(cls).where(
+            cls.id_client == id_client,
+            cls.date_of_subscription_end >= day,
+            cls.date_of_subscription_start <= day,
+        ).order_by(cls.date_of_subscription_end.desc(), cls.id_purchased.desc())
 
     def __repr__(self):
         return f"<Purchased {self.id_purchased}>"
@@ -141,26 +187,123 @@ class Trainer(db.Model):
 # Таблица Расписание
 class Schedule(db.Model):
     __tablename__ = 'schedule'
+    __table_args__ = (
+        # Пересечения в зале и у тренера ищутся по одному индексу (см. timetable.py);
+        # в PostgreSQL их дополнительно запрещают исключающие ограничения (миграция 0004)
+        db.Index('ix_schedule_id_rooms_weekday_time', 'id_rooms', 'weekday', 'time'),
+        db.Index('ix_schedule_id_trainer_weekday_time', 'id_trainer', 'weekday', 'time'),
+        db.CheckConstraint('weekday BETWEEN 0 AND 6', name='ck_schedule_weekday'),
+        db.CheckConstraint('end_time > time', name='ck_schedule_end_time'),
+    )
 
     id_schedule = db.Column(db.Integer, primary_key=True)
     id_trainer = db.Column(db.Integer, db.ForeignKey('trainers.id_trainer'), nullable=False)
     id_rooms = db.Column(db.Integer, db.ForeignKey('rooms.id_rooms'), nullable=False)
-    id_sport_types = db.Column(db.Integer, db.ForeignKey('sport_types.id_sport_types'), nullable=False)
-    day_of_week = db.Column(db.String(20), nullable=False)
-    time = db.Column(db.Time, nullable=False)
+    id_sport_types = db.Column(db.Integer, db.ForeignKey('sport_types.id_sport_types'), nullable=False, index=True)
+    weekday = db.Column(db.SmallInteger, nullable=False)
+    time = db.Column(db.Time, nullable=False)  # начало занятия
+    end_time = db.Column(db.Time, nullable=False)
+
+    # Отношения
+    records = db.relationship('Record', backref='schedule', lazy=True)
+
+    @property
+    def day_of_week(self):
+        return DAYS[self.weekday] if self.weekday is not None else None
 
     def __repr__(self):
-        return f"<Schedule {self.day_of_week} {self.time}>"
+        return f"<Schedule {self.day_of_week} {self.time}-{self.end_time}>"
+
+# Исключающие ограничения, как в миграции 0005 (btree_gist — для "=" по целым колонкам в GiST)
+event.listen(Schedule.__table__, 'before_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS btree_gist; '
+                 'DO $$ BEGIN CREATE TYPE timerange AS RANGE (subtype = time); '
+                 'EXCEPTION WHEN duplicate_object THEN NULL; END $$').execute_if(dialect='postgresql'))
+for _name, _column in (('ex_schedule_room_overlap', 'id_rooms'), ('ex_schedule_trainer_overlap', 'id_trainer')):
+    event.listen(Schedule.__table__, 'after_create',
+                 DDL(f'ALTER TABLE schedule ADD CONSTRAINT {_name} EXCLUDE USING gist '
+                     f'({_column} WITH =, weekday WITH =, timerange(time, end_time) WITH &&)')
+                 .execute_if(dialect='postgresql'))
 
 # Таблица Записи на тренировки
 class Record(db.Model):
     __tablename__ = 'records'
+    __table_args__ = (
+        # Записи на конкретное занятие за период; покрывает и внешний ключ id_schedule
+        db.Index('ix_records_id_schedule_date_of_record', 'id_schedule', 'date_of_record'),
+    )
 
     id_records = db.Column(db.Integer, primary_key=True)
-    id_purchased = db.Column(db.Integer, db.ForeignKey('purchased.id_purchased'), nullable=False)
+    id_purchased = db.Column(db.Integer, db.ForeignKey('purchased.id_purchased'), nullable=False, index=True)
     id_schedule = db.Column(db.Integer, db.ForeignKey('schedule.id_schedule'), nullable=False)
-    date_of_record = db.Column(db.Date, nullable=False)
+    date_of_record = db.Column(db.Date, nullable=False, index=True)
     attendance = db.Column(db.String(10), nullable=False)
 
     def __repr__(self):
-        return f"<Record {self.id_records}>"
\ No newline at end of file
+        return f"<Record {self.id_records}>"
+
+# Таблица Сводка посещаемости: записи и посещения по занятию за неделю (ведётся rollups.py)
+class AttendanceRollup(db.Model):
+    __tablename__ = 'attendance_rollups'
+
+    id_schedule = db.Column(db.Integer, db.ForeignKey('schedule.id_schedule', ondelete='CASCADE'), primary_key=True)
+    week_start = db.Column(db.Date, primary_key=True, index=True)  # понедельник недели
+    booked = db.Column(db.Integer, nullable=False, default=0)
+    attended = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<AttendanceRollup {self.id_schedule} {self.week_start}>"
+
+# Таблица Заполненность занятий: число записей на занятие в конкретный день (ведётся occupancy.py)
+class SlotOccupancy(db.Model):
+    __tablename__ = 'slot_occupancy'
+    __table_args__ = (
+        db.CheckConstraint('booked >= 0', name='ck_slot_occupancy_booked'),
+    )
+
+    id_schedule = db.Column(db.Integer, db.ForeignKey('schedule.id_schedule', ondelete='CASCADE'), primary_key=True)
+    date_of_record = db.Column(db.Date, primary_key=True)
+    booked = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<SlotOccupancy {self.id_schedule} {self.date_of_record} {self.booked}>"
+
+# Таблица Уведомления об окончании абонементов (пишет expiry_job.py --table)
+class ExpiryNotification(db.Model):
+    __tablename__ = 'expiry_notifications'
+    __table_args__ = (
+        db.UniqueConstraint('id_purchased', 'kind', name='uq_expiry_notifications_id_purchased_kind'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)  # expiring | lapsed
+    id_purchased = db.Column(db.Integer, db.ForeignKey('purchased.id_purchased', ondelete='CASCADE'), nullable=False)
+    id_client = db.Column(db.Integer, db.ForeignKey('clients.id_client', ondelete='CASCADE'), nullable=False,
+                          index=True)
+    date_of_subscription_end = db.Column(db.Date, nullable=False)
+    run_date = db.Column(db.Date, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<ExpiryNotification {self.kind} {self.id_purchased}>"
+
+# Таблица Состояние фоновых задач: до какой даты задача уже обработала данные
+class JobState(db.Model):
+    __tablename__ = 'job_state'
+
+    name = db.Column(db.String(50), primary_key=True)
+    last_date = db.Column(db.Date, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<JobState {self.name} {self.last_date}>"
+
+# Таблица Версии таблиц: счётчик увеличивается при каждой записи в отслеживаемую таблицу
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=func.now())
+
+    def __repr__(self):
+        return f"<TableVersion {self.table_name} {self.version}>"
\ No newline at end of file
@@ -0,0 +1,141 @@
+from datetime import date
+
+from sqlalchemy import event, func, inspect, select, tuple_
+from sqlalchemy.orm import Session
+
+from model import Record, Room, Schedule, SlotOccupancy
+from rollups import UPSERTS, record_values
+
+
+# Пар (занятие, день) в одном IN при пересчёте: держит число параметров запроса в разумных пределах
+SLOTS_PER_STATEMENT = 500
+
+
+class SlotFull(Exception):
+    def __init__(self, id_schedule, day, capacity):
+        super().__init__(f'Schedule {id_schedule} on {day} is full ({capacity} places)')
+        self.id_schedule = id_schedule
+        self.day = day
+        self.capacity = capacity
+
+
+def slot_key(id_schedule, day):
+    if id_schedule is None or day is None:
+        return None
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return int(id_schedule), day
+
+
+def capacity(connection, id_schedule):
+    return connection.execute(
+        select(Room.capacity).join(Schedule, Schedule.id_rooms == Room.id_rooms)
+        .where(Schedule.id_schedule == id_schedule)
+    ).scalar()
+
+
+def reserve(connection, id_schedule, day):
+    """Занимает место на занятии или бросает SlotFull.
+
+    Условный upsert блокирует только строку счётчика этого занятия и дня: параллельная
+    запись на то же занятие ждёт коммита и заново проверяет booked < capacity.
+    """
+    limit = capacity(connection, id_schedule)
+    if limit is None:
+        return  # несуществующее занятие отклонит внешний ключ records
+    occupancy = SlotOccupancy.__table__
+    statement = UPSERTS[connection.dialect.name](occupancy).values(
+        id_schedule=id_schedule, date_of_record=day, booked=1)
+    statement = statement.on_conflict_do_update(
+        index_elements=[occupancy.c.id_schedule, occupancy.c.date_of_record],
+        set_={'booked': occupancy.c.booked + 1},
+        where=occupancy.c.booked < limit,
+    ).returning(occupancy.c.booked)
+    if limit < 1 or connection.execute(statement).first() is None:
+        raise SlotFull(id_schedule, day, limit)
+
+
+def release(connection, id_schedule, day):
+    occupancy = SlotOccupancy.__table__
+    connection.execute(
+        occupancy.update()
+        .where(occupancy.c.id_schedule == id_schedule, occupancy.c.date_of_record == day, occupancy.c.booked > 0)
+        .values(booked=occupancy.c.booked - 1)
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def _after_flush(session, flush_context):
+    # Записи через ORM (add_record, /records, edit_record, delete_record): освобождаем, затем занимаем места
+    released, reserved = [], []
+    for obj in session.new:
+        if isinstance(obj, Record):
+            reserved.append(slot_key(*record_values(inspect(obj), 'new')[:2]))
+    for obj in session.deleted:
+        if isinstance(obj, Record):
+            released.append(slot_key(*record_values(inspect(obj), 'old')[:2]))
+    for obj in session.dirty:
+        if isinstance(obj, Record) and session.is_modified(obj, include_collections=False):
+            state = inspect(obj)
+            old, new = slot_key(*record_values(state, 'old')[:2]), slot_key(*record_values(state, 'new')[:2])
+            if old != new:
+                released.append(old)
+                reserved.append(new)
+    if not released and not reserved:
+        return
+    connection = session.connection()
+    # Один порядок блокировок во всех транзакциях — без взаимных блокировок
+    for key in sorted(filter(None, released)):
+        release(connection, *key)
+    for key in sorted(filter(None, reserved)):
+        reserve(connection, *key)
+
+
+def rebuild(session, schedule_ids=None, start=None, end=None):
+    """Пересчитывает счётчики из records — после загрузки в обход ORM (импорт, seed.py)."""
+    occupancy = SlotOccupancy.__table__
+    delete = occupancy.delete()
+    query = select(Record.id_schedule, Record.date_of_record, func.count()) \
+        .group_by(Record.id_schedule, Record.date_of_record)
+    if schedule_ids is not None:
+        delete = delete.where(occupancy.c.id_schedule.in_(list(schedule_ids)))
+        query = query.where(Record.id_schedule.in_(list(schedule_ids)))
+    if start is not None:
+        delete = delete.where(occupancy.c.date_of_record >= start)
+        query = query.where(Record.date_of_record >= start)
+    if end is not None:
+        delete = delete.where(occupancy.c.date_of_record <= end)
+        query = query.where(Record.date_of_record <= end)
+    session.execute(delete)
+    session.execute(occupancy.insert().from_select(['id_schedule', 'date_of_record', 'booked'], query))
+
+
+def rebuild_slots(session, slots):
+    """Пересчитывает счётчики только указанных (id_schedule, date) — без перебора всего диапазона дат."""
+    occupancy = SlotOccupancy.__table__
+    slots = sorted(slots)
+    for start in range(0, len(slots), SLOTS_PER_STATEMENT):
+        part = slots[start:start + SLOTS_PER_STATEMENT]
+        session.execute(occupancy.delete().where(
+            tuple_(occupancy.c.id_schedule, occupancy.c.date_of_record).in_(part)))
+        query = select(Record.id_schedule, Record.date_of_record, func.count()) \
+            .where(tuple_(Record.id_schedule, Record.date_of_record).in_(part)) \
+            .group_by(Record.id_schedule, Record.date_of_record)
+        session.execute(occupancy.insert().from_select(['id_schedule', 'date_of_record', 'booked'], query))
+
+
+def overbooked(session, slots):
+    """{(id_schedule, date): (booked, capacity)} для занятий из slots, где записей больше, чем мест в зале."""
+    occupancy = SlotOccupancy.__table__
+    slots = sorted(slots)
+    result = {}
+    for start in range(0, len(slots), SLOTS_PER_STATEMENT):
+        part = slots[start:start + SLOTS_PER_STATEMENT]
+        query = select(occupancy.c.id_schedule, occupancy.c.date_of_record, occupancy.c.booked, Room.capacity) \
+            .join(Schedule, Schedule.id_schedule == occupancy.c.id_schedule) \
+            .join(Room, Room.id_rooms == Schedule.id_rooms) \
+            .where(tuple_(occupancy.c.id_schedule, occupancy.c.date_of_record).in_(part),
+                   occupancy.c.booked > Room.capacity)
+        for id_schedule, day, booked, limit in session.execute(query):
+            result[id_schedule, day] = booked, limit
+    return result
@@ -0,0 +1,171 @@
+import base64
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from flask import current_app, request, url_for
+from sqlalchemy import Select, bindparam, tuple_
+
+from model import db
+
+
+# Страница результатов keyset-пагинации
+class Page:
+    def __init__(self, items, next_cursor=None, prev_cursor=None, sort=None, per_page=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.sort = sort
+        self.per_page = per_page
+
+    @property
+    def next_url(self):
+        return _page_url(after=self.next_cursor) if self.next_cursor else None
+
+    @property
+    def prev_url(self):
+        return _page_url(before=self.prev_cursor) if self.prev_cursor else None
+
+    def sort_url(self, column):
+        # Повторный клик по той же колонке меняет направление сортировки
+        return _page_url(sort='-' + column if self.sort == column else column)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _page_url(**params):
+    args = request.args.to_dict()
+    args.pop('after', None)
+    args.pop('before', None)
+    args.update(params)
+    args.update(request.view_args or {})
+    return url_for(request.endpoint, **args)
+
+
+def encode_cursor(values):
+    raw = json.dumps([_to_json(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(columns):
+            return None
+        return tuple(_from_json(column, value) for column, value in zip(columns, values))
+    except (ValueError, TypeError):
+        return None
+
+
+def _to_json(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _from_json(column, value):
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is time:
+        return time.fromisoformat(value)
+    return python_type(value)
+
+
+def sortable_columns(model):
+    # Сортировать можно только по NOT NULL колонкам: сравнение кортежей с NULL ломает курсор
+    return {column.key: getattr(model, column.key)
+            for column in model.__table__.columns if not column.nullable}
+
+
+def per_page_arg():
+    default = current_app.config.get('PAGE_SIZE', 50)
+    maximum = current_app.config.get('MAX_PAGE_SIZE', 500)
+    per_page = request.args.get('per_page', default, type=int)
+    return max(1, min(per_page, maximum))
+
+
+def paginate(query, pk, default_sort=None, statements=None):
+    """Keyset-пагинация запроса по (колонка сортировки, первичный ключ).
+
+    Параметры берутся из запроса: ?sort=<колонка> или ?sort=-<колонка>,
+    ?per_page=N, ?after=<курсор> / ?before=<курсор>. Стоимость страницы
+    не зависит от размера таблицы — это всегда один проход по индексу.
+
+    query — Query или select(); для select() со словарём statements готовые запросы
+    с параметрами вместо значений курсора хранятся в нём и не строятся заново.
+    """
+    model = pk.class_
+    columns = sortable_columns(model)
+    sort = request.args.get('sort', default_sort or pk.key)
+    descending = sort.startswith('-')
+    sort_column = columns.get(sort.lstrip('-'))
+    if sort_column is None:
+        sort, descending, sort_column = pk.key, False, pk
+
+    keys = [pk] if sort_column is pk else [sort_column, pk]
+    per_page = per_page_arg()
+
+    after = request.args.get('after')
+    before = request.args.get('before')
+    cursor = decode_cursor(after or before or '', keys) if (after or before) else None
+    backwards = cursor is not None and bool(before) and not after
+
+    # При движении назад порядок разворачивается, а результат переворачивается обратно
+    forward_order = not descending
+    ascending = forward_order != backwards
+    if isinstance(query, Select):
+        if statements is None:
+            statements = {}
+        cache_key = (sort_column.key, ascending, cursor is not None)
+        stmt = statements.get(cache_key)
+        if stmt is None:
+            stmt = statements[cache_key] = _keyset_statement(query, keys, ascending, cursor is not None)
+        params = {f'cursor_{i}': value for i, value in enumerate(cursor or ())}
+        params['limit'] = per_page + 1
+        rows = db.session.scalars(stmt, params).all()
+    else:
+        key = tuple_(*keys) if len(keys) > 1 else keys[0]
+        value = cursor if len(keys) > 1 else (cursor[0] if cursor else None)
+        if cursor is not None:
+            query = query.filter(key > value if ascending else key < value)
+        query = query.order_by(*[k.asc() if ascending else k.desc() for k in keys])
+        rows = query.limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def cursor_of(row):
+        return encode_cursor([getattr(row, k.key) for k in keys])
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = cursor_of(rows[-1])
+        if (cursor is not None and not backwards) or (backwards and has_more):
+            prev_cursor = cursor_of(rows[0])
+
+    return Page(rows, next_cursor=next_cursor, prev_cursor=prev_cursor, sort=sort, per_page=per_page)
+
+
+def _keyset_statement(base, keys, ascending, with_cursor):
+    # Значения курсора и размер страницы — параметры, поэтому запрос один на (сортировка, направление)
+    stmt = base
+    if with_cursor:
+        params = [bindparam(f'cursor_{i}', type_=k.type) for i, k in enumerate(keys)]
+        key = tuple_(*keys) if len(keys) > 1 else keys[0]
+        value = tuple_(*params) if len(keys) > 1 else params[0]
+        stmt = stmt.where(key > value if ascending else key < value)
+    stmt = stmt.order_by(*[k.asc() if ascending else k.desc() for k in keys])
+    return stmt.limit(bindparam('limit'))
@@ -0,0 +1,19 @@
+import argparse
+from datetime import date
+
+from app import app
+from model import db
+import occupancy
+import rollups
+
+parser = argparse.ArgumentParser(description='Пересчёт сводки посещаемости attendance_rollups '
+                                             'и заполненности занятий slot_occupancy из records')
+parser.add_argument('--start', type=date.fromisoformat, help='с даты (по умолчанию — вся история)')
+parser.add_argument('--end', type=date.fromisoformat)
+args = parser.parse_args()
+
+with app.app_context():
+    count = rollups.rebuild(db.session, start=args.start, end=args.end)
+    occupancy.rebuild(db.session, start=args.start, end=args.end)
+    db.session.commit()
+print(f'attendance_rollups: {count} rows, slot_occupancy rebuilt')
@@ -0,0 +1,175 @@
+import logging
+import random
+import threading
+import time
+
+from flask import has_request_context, request, session as http_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger(__name__)
+
+BIND_PREFIX = 'replica_'
+
+# Отставание реплики в секундах; 0, если всё полученное уже применено (или это не реплика)
+PG_LAG = text(
+    'SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+
+def binds(config):
+    """SQLALCHEMY_BINDS для реплик из SQLALCHEMY_REPLICA_URIS (как engine_options в db_pool)."""
+    return {f'{BIND_PREFIX}{i}': url for i, url in enumerate(config['SQLALCHEMY_REPLICA_URIS'])}
+
+
+class Replica:
+    def __init__(self, key, engine):
+        self.key = key
+        self.engine = engine
+        self.healthy = True
+        self.lag = None
+        self.error = None
+        self.checked_at = 0.0
+
+    def status(self):
+        return {'bind': self.key, 'url': self.engine.url.render_as_string(), 'healthy': self.healthy,
+                'lag_seconds': self.lag, 'error': self.error}
+
+
+class ReplicaSet:
+    """Реплики для чтения: здоровье и отставание проверяются не чаще раза в REPLICA_CHECK_INTERVAL секунд."""
+
+    def __init__(self):
+        self.replicas = []
+        self.sticky_seconds = 5
+        self.max_lag = 10.0
+        self.check_interval = 5
+        self._lock = threading.Lock()
+
+    def init_app(self, app, db):
+        self.sticky_seconds = app.config['REPLICA_STICKY_SECONDS']
+        self.max_lag = app.config['REPLICA_MAX_LAG_SECONDS']
+        self.check_interval = app.config['REPLICA_CHECK_INTERVAL']
+        with app.app_context():
+            self.replicas = [Replica(key, engine) for key, engine in db.engines.items()
+                             if key is not None and key.startswith(BIND_PREFIX)]
+        for replica in self.replicas:
+            event.listen(replica.engine, 'handle_error', self._on_error(replica))
+
+        @app.after_request
+        def remember_write(response):
+            # После своей записи пользователь какое-то время читает с основной базы
+            if self.replicas and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+                http_session['primary_until'] = time.time() + self.sticky_seconds
+            return response
+
+    def _on_error(self, replica):
+        def handle_error(context):
+            if context.is_disconnect or context.connection is None:
+                self.mark_down(replica, context.original_exception)
+        return handle_error
+
+    def mark_down(self, replica, exc):
+        # До следующей проверки (REPLICA_CHECK_INTERVAL) реплика не выбирается
+        replica.healthy = False
+        replica.error = str(exc)
+        replica.checked_at = time.monotonic()
+        logger.warning('Replica %s is unavailable, reading from primary: %s', replica.key, replica.error)
+
+    def check(self, replica):
+        try:
+            with replica.engine.connect() as connection:
+                if connection.dialect.name == 'postgresql':
+                    replica.lag = float(connection.execute(PG_LAG).scalar() or 0)
+                else:
+                    replica.lag = 0.0
+            replica.error = None
+            replica.healthy = replica.lag <= self.max_lag
+            if not replica.healthy:
+                logger.warning('Replica %s lags %.1fs, reading from primary', replica.key, replica.lag)
+        except Exception as exc:
+            replica.healthy = False
+            replica.error = str(exc)
+            logger.warning('Replica %s is unavailable, reading from primary: %s', replica.key, exc)
+
+    def choose(self):
+        now = time.monotonic()
+        for replica in self.replicas:
+            if now - replica.checked_at > self.check_interval:
+                with self._lock:
+                    if now - replica.checked_at > self.check_interval:
+                        replica.checked_at = now
+                        self.check(replica)
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        return random.choice(healthy) if healthy else None
+
+    def engine_for_read(self, session):
+        """Движок реплики для чтения или None — тогда основная база."""
+        if not self.replicas or not has_request_context() or request.method not in ('GET', 'HEAD'):
+            return None
+        if 'replica' not in session.info:
+            replica = None
+            if http_session.get('primary_until', 0) <= time.time():
+                replica = self.choose()
+            # Весь запрос читает из одного места, чтобы страница была согласованной
+            session.info['replica'] = replica
+        replica = session.info['replica']
+        return replica.engine if replica is not None else None
+
+    def status(self):
+        return [replica.status() for replica in self.replicas]
+
+
+replica_set = ReplicaSet()
+
+
+class RoutingSession(Session):
+    """SELECT в GET-запросах идут на реплику, запись и всё, что после неё, — на основную базу."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and replica_set.replicas:
+            read = clause is not None and getattr(clause, 'is_select', False) \
+                and getattr(clause, '_for_update_arg', None) is None
+            if read and not self._flushing:
+                engine = replica_set.engine_for_read(self)
+                if engine is not None:
+                    return engine
+            else:
+                # Свои изменения в этом же запросе нужно читать с основной базы
+                self.info['replica'] = None
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def execute(self, *args, **kwargs):
+        return self._read_with_fallback(super().execute, *args, **kwargs)
+
+    def scalars(self, *args, **kwargs):
+        return self._read_with_fallback(super().scalars, *args, **kwargs)
+
+    def scalar(self, *args, **kwargs):
+        return self._read_with_fallback(super().scalar, *args, **kwargs)
+
+    def _read_with_fallback(self, method, *args, **kwargs):
+        """Чтение, потерявшее соединение с репликой, один раз повторяется на основной базе в том же запросе.
+
+        Таймауты, блокировки и прочие ошибки самого запроса реплику не выключают: на основной
+        базе запрос упал бы так же, а нагрузка на неё удвоилась бы.
+        """
+        try:
+            return method(*args, **kwargs)
+        except DBAPIError as exc:
+            replica = self.info.get('replica')
+            # Пока запрос читает с реплики, все SELECT идут на неё; иначе ошибка не от реплики.
+            # После переключения info['replica'] — None, поэтому повтор не зацикливается
+            if replica is None:
+                raise
+            # Разрыв или неудачное подключение: handle_error (is_disconnect) уже выключил реплику
+            if replica.healthy and not exc.connection_invalidated:
+                raise
+            if replica.healthy:
+                replica_set.mark_down(replica, exc)
+            self.info['replica'] = None
+            # Соединение с репликой могло стать недействительным — транзакция начинается заново
+            self.rollback()
+            return method(*args, **kwargs)
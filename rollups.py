@@ -0,0 +1,197 @@
+from datetime import date, timedelta
+
+from sqlalchemy import and_, case, event, func, inspect, or_, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from model import db, DAYS, AttendanceRollup, Record, Schedule, SportType, Trainer
+
+ATTENDED = 'Да'
+
+# Диалекты с INSERT ... ON CONFLICT DO UPDATE
+UPSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+# Ключей (занятие, неделя) в одном запросе при пересчёте
+KEYS_PER_STATEMENT = 500
+
+# Группировки отчёта: (колонка ключа, колонка подписи)
+GROUPS = {
+    'schedule': (Schedule.id_schedule, None),
+    'trainer': (Trainer.id_trainer, Trainer.full_name),
+    'sport_type': (SportType.id_sport_types, SportType.name),
+    'week': (AttendanceRollup.week_start, None),
+}
+
+
+def week_start(day):
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return day - timedelta(days=day.weekday())
+
+
+def apply_deltas(connection, deltas):
+    """deltas: {(id_schedule, week_start): [booked, attended]} — прибавляются к сводке одним upsert на ключ."""
+    rollups = AttendanceRollup.__table__
+    insert = UPSERTS[connection.dialect.name]
+    for (id_schedule, week), (booked, attended) in sorted(deltas.items()):
+        if not booked and not attended:
+            continue
+        statement = insert(rollups).values(id_schedule=id_schedule, week_start=week, booked=booked, attended=attended)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[rollups.c.id_schedule, rollups.c.week_start],
+            set_={'booked': rollups.c.booked + statement.excluded.booked,
+                  'attended': rollups.c.attended + statement.excluded.attended},
+        ))
+
+
+def _add(deltas, id_schedule, day, attendance, sign):
+    if id_schedule is None or day is None:
+        return
+    delta = deltas.setdefault((int(id_schedule), week_start(day)), [0, 0])
+    delta[0] += sign
+    if attendance == ATTENDED:
+        delta[1] += sign
+
+
+def record_values(state, when):
+    """Значения (id_schedule, date_of_record, attendance) записи до (when='old') или после flush."""
+    values = []
+    for name in ('id_schedule', 'date_of_record', 'attendance'):
+        history = state.attrs[name].history
+        if when == 'old':
+            current = history.deleted or history.unchanged
+        else:
+            current = history.added or history.unchanged
+        values.append(current[0] if current else None)
+    return values
+
+
+def _load_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+# active_history: при изменении колонки старое значение загружается, даже если объект был expired,
+# иначе из сводки нечего вычесть
+for _attribute in (Record.id_schedule, Record.date_of_record, Record.attendance):
+    event.listen(_attribute, 'set', _load_old_value, active_history=True)
+
+
+@event.listens_for(Session, 'after_flush')
+def _after_flush(session, flush_context):
+    # Записи, изменённые через ORM (add_record, edit_record, delete_record и т.п.)
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Record):
+            _add(deltas, *record_values(inspect(obj), 'new'), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Record):
+            _add(deltas, *record_values(inspect(obj), 'old'), -1)
+    for obj in session.dirty:
+        if isinstance(obj, Record) and session.is_modified(obj, include_collections=False):
+            state = inspect(obj)
+            _add(deltas, *record_values(state, 'old'), -1)
+            _add(deltas, *record_values(state, 'new'), 1)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def _daily_counts(session):
+    return session.query(
+        Record.id_schedule, Record.date_of_record,
+        func.count(), func.sum(case((Record.attendance == ATTENDED, 1), else_=0)),
+    ).group_by(Record.id_schedule, Record.date_of_record)
+
+
+def _replace(session, delete, query):
+    # Группировка по дням в базе, по неделям — здесь, чтобы не зависеть от диалекта
+    deltas = {}
+    for id_schedule, day, booked, attended in query:
+        delta = deltas.setdefault((id_schedule, week_start(day)), [0, 0])
+        delta[0] += booked
+        delta[1] += attended or 0
+    session.execute(delete)
+    rows = [{'id_schedule': id_schedule, 'week_start': week, 'booked': booked, 'attended': attended}
+            for (id_schedule, week), (booked, attended) in deltas.items()]
+    if rows:
+        session.execute(AttendanceRollup.__table__.insert(), rows)
+    return len(rows)
+
+
+def rebuild(session, schedule_ids=None, start=None, end=None):
+    """Пересчитывает сводку из records — после загрузки в обход ORM (импорт, seed.py) или для проверки.
+
+    Без аргументов пересчитывается всё; иначе только указанные занятия и недели, покрывающие [start, end].
+    """
+    rollups = AttendanceRollup.__table__
+    delete = rollups.delete()
+    query = _daily_counts(session)
+    if schedule_ids is not None:
+        delete = delete.where(rollups.c.id_schedule.in_(list(schedule_ids)))
+        query = query.filter(Record.id_schedule.in_(list(schedule_ids)))
+    if start is not None:
+        start = week_start(start)
+        delete = delete.where(rollups.c.week_start >= start)
+        query = query.filter(Record.date_of_record >= start)
+    if end is not None:
+        end = week_start(end)
+        delete = delete.where(rollups.c.week_start <= end)
+        query = query.filter(Record.date_of_record < end + timedelta(days=7))
+    return _replace(session, delete, query)
+
+
+def rebuild_slots(session, slots):
+    """Пересчитывает сводку только по неделям, в которые попадают указанные (id_schedule, date)."""
+    rollups = AttendanceRollup.__table__
+    keys = sorted({(int(id_schedule), week_start(day)) for id_schedule, day in slots})
+    count = 0
+    for start in range(0, len(keys), KEYS_PER_STATEMENT):
+        part = keys[start:start + KEYS_PER_STATEMENT]
+        delete = rollups.delete().where(tuple_(rollups.c.id_schedule, rollups.c.week_start).in_(part))
+        query = _daily_counts(session).filter(or_(*[
+            and_(Record.id_schedule == id_schedule, Record.date_of_record >= week,
+                 Record.date_of_record < week + timedelta(days=7))
+            for id_schedule, week in part
+        ]))
+        count += _replace(session, delete, query)
+    return count
+
+
+def report(group, start=None, end=None):
+    """Посещаемость по занятию, тренеру, виду спорта или неделе — только из сводки."""
+    key, label = GROUPS[group]
+    columns = [key, func.sum(AttendanceRollup.booked), func.sum(AttendanceRollup.attended)]
+    if group == 'schedule':
+        columns += [Schedule.weekday, Schedule.time, Trainer.full_name]
+    elif label is not None:
+        columns.append(label)
+    query = db.session.query(*columns)
+    if group != 'week':
+        query = query.select_from(AttendanceRollup).join(Schedule)
+        if group in ('schedule', 'trainer'):
+            query = query.join(Trainer, Schedule.id_trainer == Trainer.id_trainer)
+        elif group == 'sport_type':
+            query = query.join(SportType, Schedule.id_sport_types == SportType.id_sport_types)
+    if start is not None:
+        query = query.filter(AttendanceRollup.week_start >= week_start(start))
+    if end is not None:
+        query = query.filter(AttendanceRollup.week_start <= week_start(end))
+    query = query.group_by(*[key] + columns[3:]).order_by(key)
+
+    rows = []
+    for row in query:
+        value, booked, attended = row[0], row[1] or 0, row[2] or 0
+        if group == 'schedule':
+            title = f'{DAYS[row[3]]} {row[4]:%H:%M} ({row[5]})'
+        elif group == 'week':
+            title = value.isoformat()
+        else:
+            title = row[3]
+        rows.append({
+            'key': value.isoformat() if group == 'week' else value,
+            'label': title,
+            'booked': booked,
+            'attended': attended,
+            'rate': round(attended / booked, 4) if booked else None,
+        })
+    return rows
+
@@ -0,0 +1,178 @@
+import argparse
+import random
+from datetime import date, time, timedelta
+
+from app import app
+from model import db, User, Client, Review, PaymentType, Room, Equipment, SportType, Subscription, Purchased, \
+    Trainer, Schedule, Record, DAYS
+import occupancy
+import rollups
+import versioning
+
+# Объём данных при --scale 1; остальные масштабы пропорциональны
+BASE = {
+    'clients': 10000,
+    'reviews': 3000,
+    'trainers': 20,
+    'rooms': 8,
+    'equipment': 60,
+    'schedule': 120,
+    'purchased': 15000,
+    'records': 100000,
+}
+
+FIRST_NAMES = ['Иван', 'Анна', 'Пётр', 'Мария', 'Алексей', 'Ольга', 'Дмитрий', 'Елена', 'Сергей', 'Наталья']
+LAST_NAMES = ['Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев', 'Козлов', 'Новиков', 'Морозов']
+SUBSCRIPTIONS = [('Разовое посещение', 500, 1), ('Месяц', 3000, 30), ('Квартал', 8000, 90), ('Год', 25000, 365)]
+
+
+def insert(model, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(model.__table__.insert(), rows[start:start + batch_size])
+    versioning.mark_changed(db.session, {model.__tablename__})
+
+
+def ids(column):
+    return [value for value, in db.session.query(column).order_by(column)]
+
+
+def ensure_users():
+    for username, password, role in (('admin', '1234', 'admin'), ('user', '4321', 'user')):
+        if User.query.filter_by(username=username).first() is None:
+            user = User(username=username, role=role)
+            user.set_password(password)
+            db.session.add(user)
+
+
+def reference_data():
+    if PaymentType.query.first() is None:
+        db.session.add_all(PaymentType(name=name) for name in ('Наличные', 'Карта', 'Перевод'))
+    if SportType.query.first() is None:
+        db.session.add_all(SportType(name=name) for name in ('Йога', 'Бокс', 'Пилатес', 'Кроссфит', 'Плавание'))
+    if Subscription.query.first() is None:
+        db.session.add_all(Subscription(type_of_subscription=name, price=price) for name, price, _ in SUBSCRIPTIONS)
+    db.session.flush()
+
+
+def seed(scale, batch_size, rnd):
+    counts = {table: max(1, int(count * scale)) for table, count in BASE.items()}
+    today = date.today()
+
+    ensure_users()
+    reference_data()
+    payment_types = ids(PaymentType.id_payment_types)
+    sport_types = ids(SportType.id_sport_types)
+    subscriptions = [(row.id_subscriptions, row.type_of_subscription) for row in Subscription.query.all()]
+    duration = {name: days for name, _, days in SUBSCRIPTIONS}
+
+    insert(Room, [{'name': f'Зал {i + 1}', 'capacity': rnd.randint(10, 40)} for i in range(counts['rooms'])],
+           batch_size)
+    rooms = ids(Room.id_rooms)
+    insert(Equipment, [{'name': f'Тренажёр {i + 1}', 'id_rooms': rnd.choice(rooms)}
+                       for i in range(counts['equipment'])], batch_size)
+
+    insert(Trainer, [{
+        'full_name': f'{rnd.choice(LAST_NAMES)} {rnd.choice(FIRST_NAMES)}',
+        'date_of_birth': date(1970, 1, 1) + timedelta(days=rnd.randint(0, 10000)),
+        'experience': rnd.randint(1, 25),
+        'specialization': f'Специализация {rnd.randint(1, 10)}',
+    } for _ in range(counts['trainers'])], batch_size)
+    trainers = ids(Trainer.id_trainer)
+
+    # Часовые занятия с 7 до 22 без пересечений по залу и тренеру
+    slots, busy_trainers = [], set()
+    grid = [(room, weekday, hour) for room in rooms for weekday in range(len(DAYS)) for hour in range(7, 22)]
+    rnd.shuffle(grid)
+    for room, weekday, hour in grid:
+        if len(slots) >= counts['schedule']:
+            break
+        free = [trainer for trainer in trainers if (trainer, weekday, hour) not in busy_trainers]
+        if not free:
+            continue
+        trainer = rnd.choice(free)
+        busy_trainers.add((trainer, weekday, hour))
+        slots.append({
+            'id_trainer': trainer,
+            'id_rooms': room,
+            'id_sport_types': rnd.choice(sport_types),
+            'weekday': weekday,
+            'time': time(hour),
+            'end_time': time(hour + 1),
+        })
+    counts['schedule'] = len(slots)
+    insert(Schedule, slots, batch_size)
+    slots_by_weekday = {}
+    for row in db.session.query(Schedule.id_schedule, Schedule.weekday):
+        slots_by_weekday.setdefault(row.weekday, []).append(row.id_schedule)
+
+    insert(Client, [{
+        'full_name': f'{rnd.choice(LAST_NAMES)} {rnd.choice(FIRST_NAMES)} {i}',
+        'date_of_birth': date(1960, 1, 1) + timedelta(days=rnd.randint(0, 16000)),
+        'gender': rnd.choice(('М', 'Ж')),
+        'phone_number': f'+79{i:09d}',
+    } for i in range(counts['clients'])], batch_size)
+    clients = ids(Client.id_client)
+
+    insert(Review, [{
+        'id_client': rnd.choice(clients),
+        'rating': rnd.randint(1, 5),
+        'comments': rnd.choice(('Отлично', 'Хорошо', 'Нормально', None)),
+        'date_of_review': today - timedelta(days=rnd.randint(0, 1000)),
+    } for _ in range(counts['reviews'])], batch_size)
+
+    purchased_rows = []
+    for _ in range(counts['purchased']):
+        id_subscriptions, name = rnd.choice(subscriptions)
+        start = today - timedelta(days=rnd.randint(0, 1000))
+        purchased_rows.append({
+            'id_client': rnd.choice(clients),
+            'id_subscriptions': id_subscriptions,
+            'id_payment_types': rnd.choice(payment_types),
+            'date_of_payment': start - timedelta(days=rnd.randint(0, 3)),
+            'date_of_subscription_start': start,
+            'date_of_subscription_end': start + timedelta(days=duration.get(name, 30)),
+        })
+    insert(Purchased, purchased_rows, batch_size)
+    purchased = [(row.id_purchased, row.date_of_subscription_start, row.date_of_subscription_end)
+                 for row in db.session.query(Purchased.id_purchased, Purchased.date_of_subscription_start,
+                                             Purchased.date_of_subscription_end)]
+
+    # Запись — на занятие того же дня недели в пределах срока абонемента
+    records, remaining = [], counts['records']
+    while remaining > 0:
+        id_purchased, start, end = rnd.choice(purchased)
+        day = start + timedelta(days=rnd.randint(0, (end - start).days))
+        slots = slots_by_weekday.get(day.weekday())
+        if not slots:
+            continue
+        remaining -= 1
+        records.append({
+            'id_purchased': id_purchased,
+            'id_schedule': rnd.choice(slots),
+            'date_of_record': day,
+            'attendance': 'Да' if rnd.random() < 0.8 else 'Нет',
+        })
+        if len(records) >= batch_size:
+            insert(Record, records, batch_size)
+            records = []
+    insert(Record, records, batch_size)
+    rollups.rebuild(db.session)
+    occupancy.rebuild(db.session)
+
+    db.session.commit()
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Генерация связанных тестовых данных заданного объёма')
+    parser.add_argument('--scale', type=float, default=1.0, help='1.0 = 10 тыс. клиентов и 100 тыс. записей')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--random-seed', type=int, default=42)
+    parser.add_argument('--create-tables', action='store_true', help='создать таблицы через db.create_all()')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.create_tables:
+            db.create_all()
+        counts = seed(args.scale, args.batch_size, random.Random(args.random_seed))
+    print(', '.join(f'{table}: {count}' for table, count in counts.items()))
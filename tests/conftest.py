@@ -0,0 +1,166 @@
+"""Общие фикстуры: приложение на двух файлах SQLite — основная база и реплика для чтения.
+
+Настройки задаются через окружение до импорта app, как в рабочем запуске.
+"""
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date, time, timedelta
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DB_DIR = tempfile.mkdtemp(prefix='gym-tests-')
+PRIMARY = os.path.join(DB_DIR, 'primary.db')
+REPLICA = os.path.join(DB_DIR, 'replica.db')
+
+os.environ.update({
+    'DATABASE_URL': f'sqlite:///{PRIMARY}',
+    'DATABASE_REPLICA_URLS': f'sqlite:///{REPLICA}',
+    'REPLICA_STICKY_SECONDS': '60',
+    'REPLICA_CHECK_INTERVAL': '3600',
+    'SECRET_KEY': 'tests',
+    # Страницы каждый раз строятся заново: считаются запросы самой страницы
+    'CONDITIONAL_GET': '0',
+    'FRAGMENT_CACHE_ENABLED': '0',
+    'ACCESS_LOG': '0',
+    'LOG_LEVEL': 'WARNING',
+})
+
+from app import app as flask_app  # noqa: E402
+from model import db, User, Client, Review, PaymentType, Room, Equipment, SportType, Subscription, Purchased, \
+    Trainer, Schedule, Record  # noqa: E402
+from model import AttendanceRollup, SlotOccupancy  # noqa: E402
+from replicas import replica_set  # noqa: E402
+import occupancy  # noqa: E402
+import rollups  # noqa: E402
+
+
+
+@event.listens_for(Engine, 'connect')
+def _foreign_keys(dbapi_connection, connection_record):
+    # Как в PostgreSQL: удаление строки, на которую ссылаются, отклоняется
+    if type(dbapi_connection).__module__.startswith('sqlite3'):
+        dbapi_connection.execute('PRAGMA foreign_keys=ON')
+
+
+# Строк в каждой таблице; у каждой строки свои связанные строки, чтобы N+1 был заметен
+ROWS = 12
+
+
+def seed(rows=ROWS):
+    admin = User(username='admin', role='admin')
+    admin.set_password('1234')
+    user = User(username='user', role='user')
+    user.set_password('1234')
+    db.session.add_all([admin, user])
+    start = date(2024, 1, 1)
+    for i in range(rows):
+        client = Client(full_name=f'Client {i}', date_of_birth=date(1990, 1, 1), gender='F',
+                        phone_number=f'+7900{i:04d}')
+        room = Room(name=f'Room {i}', capacity=10)
+        trainer = Trainer(full_name=f'Trainer {i}', date_of_birth=date(1985, 1, 1), experience=i,
+                          specialization='yoga')
+        sport_type = SportType(name=f'Sport {i}')
+        subscription = Subscription(type_of_subscription=f'Plan {i}', price=100 + i)
+        payment_type = PaymentType(name=f'Payment {i}')
+        db.session.add_all([client, room, trainer, sport_type, subscription, payment_type])
+        db.session.flush()
+        purchased = Purchased(id_client=client.id_client, id_subscriptions=subscription.id_subscriptions,
+                              id_payment_types=payment_type.id_payment_types, date_of_payment=start,
+                              date_of_subscription_start=start, date_of_subscription_end=date(2024, 12, 31))
+        schedule = Schedule(id_trainer=trainer.id_trainer, id_rooms=room.id_rooms,
+                            id_sport_types=sport_type.id_sport_types, weekday=i % 7, time=time(10, 0),
+                            end_time=time(11, 0))
+        db.session.add_all([
+            purchased, schedule,
+            Review(id_client=client.id_client, rating=5, comments='ok', date_of_review=start),
+            Equipment(id_rooms=room.id_rooms, name=f'Mat {i}'),
+        ])
+        db.session.flush()
+        db.session.add(Record(id_purchased=purchased.id_purchased, id_schedule=schedule.id_schedule,
+                              date_of_record=start + timedelta(days=i), attendance='Да'))
+    db.session.commit()
+
+
+def summaries():
+    """Сводка посещаемости и счётчики мест без нулевых строк (после удалений они остаются)."""
+    attendance = {(row.id_schedule, row.week_start, row.booked, row.attended)
+                  for row in db.session.scalars(select(AttendanceRollup)) if row.booked or row.attended}
+    slots = {(row.id_schedule, row.date_of_record, row.booked)
+             for row in db.session.scalars(select(SlotOccupancy)) if row.booked}
+    return attendance, slots
+
+
+def rebuilt_summaries():
+    """То же, но пересчитанное с нуля из records; база не меняется."""
+    rollups.rebuild(db.session)
+    occupancy.rebuild(db.session)
+    rebuilt = summaries()
+    db.session.rollback()
+    return rebuilt
+
+
+def copy_to_replica():
+    # Реплика — копия основной базы; соединения закрываются, чтобы файл был согласованным
+    for engine in db.engines.values():
+        engine.dispose()
+    shutil.copyfile(PRIMARY, REPLICA)
+    for replica in replica_set.replicas:
+        replica.healthy = True
+        replica.error = None
+
+
+@pytest.fixture(scope='session')
+def app():
+    # Шаблоны лежат в корне проекта, рядом с модулями
+    flask_app.template_folder = flask_app.root_path
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        db.create_all()
+        seed()
+        copy_to_replica()
+    yield flask_app
+    shutil.rmtree(DB_DIR, ignore_errors=True)
+
+
+def login(app, username):
+    client = app.test_client()
+    response = client.post('/login', data={'username': username, 'password': '1234'})
+    assert response.status_code == 302
+    # Вход — запись: без сброса следующие чтения шли бы на основную базу
+    with client.session_transaction() as session:
+        session.pop('primary_until', None)
+    return client
+
+
+@pytest.fixture
+def client(app):
+    return login(app, 'admin')
+
+
+@pytest.fixture
+def user_client(app):
+    return login(app, 'user')
+
+
+@pytest.fixture
+def statements(app):
+    """Список (bind, SQL) всех запросов к основной базе (bind None) и репликам."""
+    executed = []
+    listeners = []
+    with app.app_context():
+        engines = dict(db.engines)
+    for key, engine in engines.items():
+        def listener(conn, cursor, statement, parameters, context, executemany, key=key):
+            executed.append((key, statement))
+        event.listen(engine, 'before_cursor_execute', listener)
+        listeners.append((engine, listener))
+    yield executed
+    for engine, listener in listeners:
+        event.remove(engine, 'before_cursor_execute', listener)
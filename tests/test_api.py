@@ -0,0 +1,94 @@
+import gzip
+import json
+
+import pytest
+
+
+def get(client, url, **headers):
+    response = client.get(url, headers=headers)
+    return response, (response.get_json() if response.headers.get('Content-Encoding') is None else None)
+
+
+def test_fields_selects_columns(client):
+    response, data = get(client, '/api/v1/rooms?fields=id_rooms,name&per_page=3')
+
+    assert response.status_code == 200
+    assert [set(item) for item in data['items']] == [{'id_rooms', 'name'}] * 3
+
+
+def test_unknown_field_is_rejected(client):
+    response, data = get(client, '/api/v1/rooms?fields=id_rooms,password')
+
+    assert response.status_code == 400
+    assert data == {'error': 'unknown fields: password'}
+
+
+def test_filters_only_on_indexed_columns(client):
+    response, data = get(client, '/api/v1/equipment?id_rooms=2')
+    assert response.status_code == 200
+    assert data['items'] and {item['id_rooms'] for item in data['items']} == {2}
+
+    response, data = get(client, '/api/v1/purchased?date_of_subscription_end__gte=2024-12-31&fields=id_purchased')
+    assert response.status_code == 200
+
+    response, data = get(client, '/api/v1/equipment?name=Mat 1')
+    assert response.status_code == 400
+    assert data['error'].startswith("cannot filter on 'name'")
+
+    response, data = get(client, '/api/v1/equipment?id_rooms__like=2')
+    assert response.status_code == 400
+
+
+def test_keyset_cursor_walks_all_rows(client):
+    _, full = get(client, '/api/v1/clients?fields=id_client&sort=-id_client&per_page=500')
+    expected = [item['id_client'] for item in full['items']]
+
+    seen, url = [], '/api/v1/clients?fields=id_client&sort=-id_client&per_page=5'
+    while True:
+        _, data = get(client, url)
+        seen += [item['id_client'] for item in data['items']]
+        if not data['next']:
+            break
+        url = f'/api/v1/clients?fields=id_client&sort=-id_client&per_page=5&after={data["next"]}'
+
+    assert seen == expected
+    # Назад с последней страницы — предыдущие пять строк
+    _, back = get(client, f'/api/v1/clients?fields=id_client&sort=-id_client&per_page=5&before={data["prev"]}')
+    assert [item['id_client'] for item in back['items']] == expected[-len(data['items']) - 5:-len(data['items'])]
+
+
+def test_user_sees_only_user_tables(user_client):
+    response, data = get(user_client, '/api/v1/')
+    assert 'rooms' in data and 'records' not in data
+
+    assert get(user_client, '/api/v1/records')[0].status_code == 403
+    assert get(user_client, '/api/v1/records/1')[0].status_code == 403
+    assert get(user_client, '/api/v1/rooms/1')[0].status_code == 200
+
+
+@pytest.fixture
+def compress_all(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'API_COMPRESS_MIN_SIZE', 1)
+
+
+@pytest.mark.parametrize('accept, encoding', [
+    ('gzip', 'gzip'),
+    ('br, gzip', 'br'),
+    ('br;q=0.5, gzip', 'gzip'),
+    ('identity', None),
+])
+def test_content_encoding_negotiation(client, compress_all, accept, encoding):
+    if encoding == 'br':
+        brotli = pytest.importorskip('brotli')
+    plain = client.get('/api/v1/rooms?per_page=5').get_data()
+
+    response = client.get('/api/v1/rooms?per_page=5', headers={'Accept-Encoding': accept})
+
+    assert response.headers.get('Content-Encoding') == encoding
+    assert 'Accept-Encoding' in response.headers['Vary']
+    body = response.get_data()
+    if encoding == 'gzip':
+        body = gzip.decompress(body)
+    elif encoding == 'br':
+        body = brotli.decompress(body)
+    assert json.loads(body) == json.loads(plain)
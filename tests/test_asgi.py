@@ -0,0 +1,56 @@
+import time
+
+import pytest
+from sqlalchemy import event
+from starlette.testclient import TestClient
+
+import asgi
+from model import db, User
+
+
+@pytest.fixture
+def asgi_client(app):
+    with TestClient(asgi.app) as client:
+        yield client
+
+
+def session_cookie(app, **data):
+    return app.session_interface.get_signing_serializer(app).dumps(data)
+
+
+def read_cookie(app, value):
+    return app.session_interface.get_signing_serializer(app).loads(value)
+
+
+@pytest.fixture
+def user_queries(asgi_client):
+    executed = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM users' in statement:
+            executed.append(statement)
+    event.listen(asgi.engine.sync_engine, 'before_cursor_execute', listener)
+    yield executed
+    event.remove(asgi.engine.sync_engine, 'before_cursor_execute', listener)
+
+
+def test_expired_user_cache_is_refreshed_in_cookie(app, asgi_client, user_queries):
+    with app.app_context():
+        admin = db.session.scalars(db.select(User).filter_by(username='admin')).one()
+        stale = {'id': admin.id, 'username': 'admin', 'role': 'admin', 'checked_at': 0}
+    name = app.config['SESSION_COOKIE_NAME']
+    asgi_client.cookies.set(name, session_cookie(app, _user_id=str(admin.id), user_cache=stale))
+
+    response = asgi_client.get('/api/search/clients?q=Client')
+    assert response.status_code == 200
+    assert len(user_queries) == 1
+    refreshed = read_cookie(app, response.cookies[name])
+    assert refreshed['_user_id'] == str(admin.id)
+    assert time.time() - refreshed['user_cache']['checked_at'] < 60
+
+    # Со свежим кешем в cookie пользователь из базы больше не читается и cookie не переписывается
+    asgi_client.cookies.set(name, response.cookies[name])
+    response = asgi_client.get('/api/search/clients?q=Client')
+    assert response.status_code == 200
+    assert len(user_queries) == 1
+    assert name not in response.cookies
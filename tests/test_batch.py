@@ -0,0 +1,102 @@
+from decimal import Decimal
+
+from sqlalchemy import func, select
+
+from conftest import rebuilt_summaries, summaries
+from model import db, Purchased, Record, Room, Subscription
+
+
+def post(client, table_name, **data):
+    return client.post(f'/batch/{table_name}', json=data)
+
+
+def test_ids_must_be_a_list(app, client):
+    with app.app_context():
+        before = db.session.scalars(select(Room.capacity).order_by(Room.id_rooms)).all()
+
+    response = post(client, 'rooms', action='update', ids='12', column='capacity', value='7')
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'ids must be a list of integers'}
+    with app.app_context():
+        assert db.session.scalars(select(Room.capacity).order_by(Room.id_rooms)).all() == before
+
+
+def test_decimal_price_update(app, client):
+    with app.app_context():
+        ids = db.session.scalars(select(Subscription.id_subscriptions).limit(2)).all()
+
+    response = post(client, 'subscriptions', action='update', ids=ids, column='price', value='19.99')
+
+    assert response.status_code == 200
+    assert response.get_json() == {'action': 'update', 'affected': 2}
+    with app.app_context():
+        prices = db.session.scalars(select(Subscription.price).where(Subscription.id_subscriptions.in_(ids))).all()
+    assert prices == [Decimal('19.99')] * 2
+
+
+def test_bad_decimal_is_rejected(client):
+    response = post(client, 'subscriptions', action='update', ids=[1], column='price', value='cheap')
+
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('bad value for price')
+
+
+def test_referenced_delete_commits_nothing(app, client):
+    with app.app_context():
+        empty = Room(name='Empty room', capacity=1)
+        db.session.add(empty)
+        db.session.commit()
+        # На первый зал ссылаются занятия и инвентарь
+        ids = [empty.id_rooms, db.session.scalar(select(func.min(Room.id_rooms)))]
+        count = db.session.scalar(select(func.count()).select_from(Room))
+
+    response = post(client, 'rooms', action='delete', ids=ids)
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Some rows are still referenced by other tables'}
+    with app.app_context():
+        assert db.session.scalar(select(func.count()).select_from(Room)) == count
+
+
+def test_max_rows_is_enforced(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'BATCH_MAX_ROWS', 2)
+
+    response = post(client, 'rooms', action='update', ids=[1, 2, 3], column='capacity', value='7')
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'at most 2 rows per operation'}
+
+
+def test_user_cannot_change_admin_tables(user_client):
+    response = post(user_client, 'rooms', action='update', ids=[1], column='capacity', value='7')
+    assert response.status_code == 403
+
+    response = user_client.post('/batch/rooms', data={'action': 'delete', 'ids': ['1']})
+    assert response.status_code == 302
+    assert response.headers['Location'] == '/'
+
+
+def test_user_can_change_open_tables(app, user_client):
+    with app.app_context():
+        id_purchased = db.session.scalar(select(func.max(Purchased.id_purchased)))
+    response = post(user_client, 'purchased', action='update', ids=[id_purchased],
+                    column='date_of_subscription_end', value='2025-01-31')
+
+    assert response.status_code == 200
+    assert response.get_json() == {'action': 'update', 'affected': 1}
+
+
+def test_record_update_and_delete_keep_summaries(app, client):
+    with app.app_context():
+        ids = db.session.scalars(select(Record.id_records).order_by(Record.id_records).limit(4)).all()
+
+    response = post(client, 'records', action='update', ids=ids[:3], column='attendance', value='Нет')
+    assert response.status_code == 200
+    with app.app_context():
+        assert summaries() == rebuilt_summaries()
+
+    response = post(client, 'records', action='delete', ids=ids[2:])
+    assert response.get_json() == {'action': 'delete', 'affected': 2}
+    with app.app_context():
+        assert summaries() == rebuilt_summaries()
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+
+@pytest.fixture
+def primary_client(app, client, monkeypatch):
+    """Клиент с условным GET, читающий с основной базы: версии до и после записи из одного места."""
+    monkeypatch.setitem(app.config, 'CONDITIONAL_GET', True)
+    with client.session_transaction() as session:
+        session['primary_until'] = time.time() + 3600
+    return client
+
+
+def etag(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return response.headers['ETag']
+
+
+def test_repeat_get_is_304_after_one_query(primary_client, statements):
+    tag = etag(primary_client, '/table/rooms')
+    statements.clear()
+
+    response = primary_client.get('/table/rooms', headers={'If-None-Match': tag})
+
+    assert response.status_code == 304
+    assert len(statements) == 1
+    assert 'table_versions' in statements[0][1]
+
+
+@pytest.mark.parametrize('url, write', [
+    ('/table/rooms', lambda client: client.post('/edit_room/1', data={'name': 'Room 0', 'capacity': '11'})),
+    ('/table/rooms', lambda client: client.post('/batch/rooms', json={
+        'action': 'update', 'ids': [1], 'column': 'capacity', 'value': '12'})),
+    # Зал выводится на странице инвентаря, поэтому его правка меняет и её ETag
+    ('/table/equipment', lambda client: client.post('/edit_room/1', data={'name': 'Room 0', 'capacity': '13'})),
+    ('/table/records', lambda client: client.post('/batch/records', json={
+        'action': 'update', 'ids': [1], 'column': 'attendance', 'value': 'Да'})),
+])
+def test_write_changes_etag(primary_client, url, write):
+    before = etag(primary_client, url)
+
+    assert write(primary_client).status_code in (200, 302)
+    with primary_client.session_transaction() as session:
+        session.pop('_flashes', None)
+    response = primary_client.get(url, headers={'If-None-Match': before})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != before
+
+
+def test_unrelated_write_keeps_etag(primary_client):
+    before = etag(primary_client, '/table/rooms')
+
+    primary_client.post('/edit_sport_type/2', data={'name': 'Sport 1'})
+    with primary_client.session_transaction() as session:
+        session.pop('_flashes', None)
+
+    assert primary_client.get('/table/rooms', headers={'If-None-Match': before}).status_code == 304
+
+
+def test_pending_flash_disables_304(primary_client):
+    tag = etag(primary_client, '/table/rooms')
+    with primary_client.session_transaction() as session:
+        session['_flashes'] = [('message', 'Room updated successfully!')]
+
+    response = primary_client.get('/table/rooms', headers={'If-None-Match': tag})
+
+    assert response.status_code == 200
+    assert b'Room updated successfully!' in response.data
+    assert 'ETag' not in response.headers
@@ -0,0 +1,54 @@
+import pytest
+
+from fragments import fragment_cache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(fragment_cache, 'enabled', True)
+    return fragment_cache
+
+
+def counters(cache):
+    return cache.hits, cache.misses
+
+
+def test_rows_are_shared_but_actions_follow_role(cache, client, user_client):
+    hits, misses = counters(cache)
+    admin_page = client.get('/table/rooms?per_page=5').data
+    assert counters(cache) == (hits, misses + 1)
+
+    user_page = user_client.get('/table/rooms?per_page=5').data
+    assert counters(cache) == (hits + 1, misses + 1)
+
+    assert b'Room 0' in admin_page and b'Room 0' in user_page
+    assert b'href="/edit_room/1"' in admin_page
+    assert b'/edit_room/' not in user_page
+    assert b'/delete_room/' not in user_page
+    assert b'<!--actions:' not in admin_page + user_page
+
+    # Повторный запрос администратора — из кеша, со своими ссылками
+    assert client.get('/table/rooms?per_page=5').data == admin_page
+    assert counters(cache) == (hits + 2, misses + 1)
+
+
+def test_open_tables_show_actions_to_users(cache, user_client):
+    page = user_client.get('/table/reviews?per_page=5').data
+
+    assert b'/edit_review/' in page
+    assert b'/delete_review/' in page
+
+
+@pytest.mark.parametrize('write', [
+    lambda client: client.post('/edit_sport_type/1', data={'name': 'Renamed sport'}),
+    lambda client: client.post('/batch/sport_types', json={'action': 'delete', 'ids': [99999]}),
+])
+def test_write_invalidates_rows(cache, client, write):
+    client.get('/table/sport_types?per_page=5')
+    hits, misses = counters(cache)
+
+    assert write(client).status_code in (200, 302)
+    page = client.get('/table/sport_types?per_page=5').data
+
+    assert counters(cache) == (hits, misses + 1)
+    assert b'Renamed sport' in page
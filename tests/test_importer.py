@@ -0,0 +1,40 @@
+from sqlalchemy import func, select
+
+from conftest import rebuilt_summaries, summaries
+from importer import import_rows
+from model import db, Client, Purchased, Schedule
+
+
+def test_import_rows_in_several_chunks(app):
+    rows = [{'full_name': f'Imported {i}', 'date_of_birth': '1995-05-05', 'gender': 'M',
+             'phone_number': f'+7911{i:04d}'} for i in range(5)]
+    rows[3]['date_of_birth'] = 'not a date'
+
+    with app.app_context():
+        report = import_rows('clients', rows, batch_size=2, per_chunk=True)
+        imported = db.session.scalar(select(func.count()).where(Client.full_name.like('Imported %')))
+
+    assert report.inserted == 4
+    assert [line for line, _ in report.errors] == [5]
+    assert imported == 4
+
+
+def test_record_import_reports_overbooked_rows(app):
+    with app.app_context():
+        id_purchased = db.session.scalar(select(func.min(Purchased.id_purchased)))
+        schedule = db.session.scalars(select(Schedule).order_by(Schedule.id_schedule).limit(1)).one()
+        capacity = schedule.room.capacity
+        # Даты вперемешку: пересчитываются только затронутые занятия и дни, а не весь диапазон
+        rows = [{'date_of_record': day, 'attendance': 'Да', 'id_purchased': str(id_purchased),
+                 'id_schedule': str(schedule.id_schedule)}
+                for day in ['2024-06-03'] * (capacity + 2) + ['2024-02-05', '2024-09-02']]
+
+        report = import_rows('records', rows, batch_size=5)
+
+        assert report.errors == []
+        assert report.inserted == capacity + 4
+        # Строки 2..capacity+1 занимают все места, следующие две — сверх вместимости
+        assert [line for line, _ in report.overbooked] == [capacity + 2, capacity + 3]
+        assert report.overbooked[0][1] == \
+            f'schedule {schedule.id_schedule} on 2024-06-03: {capacity + 2} records for {capacity} places'
+        assert summaries() == rebuilt_summaries()
@@ -0,0 +1,23 @@
+import re
+
+import pytest
+
+import crud
+from conftest import ROWS
+
+# Таблицы со связями: без joinedload каждая строка страницы добавляла бы запросы
+LISTINGS = [table.name for table in crud.TABLES if table.model.__mapper__.relationships]
+
+
+@pytest.mark.parametrize('table_name', LISTINGS)
+def test_listing_query_count_does_not_depend_on_rows(client, statements, table_name):
+    counts = {}
+    for per_page in (1, ROWS):
+        statements.clear()
+        response = client.get(f'/table/{table_name}?per_page={per_page}')
+        assert response.status_code == 200
+        assert len(re.findall(rb'name="ids" value="\d+"', response.data)) == per_page
+        counts[per_page] = len(statements)
+
+    assert counts[1] == counts[ROWS]
+    assert counts[1] == 1
@@ -0,0 +1,28 @@
+from cache import reference_cache
+
+
+def test_empty_query_returns_nothing(client):
+    response = client.get('/api/search/clients?q=')
+
+    assert response.status_code == 200
+    assert response.get_json() == []
+
+
+def test_search_by_name_and_phone_prefix(client):
+    by_name = client.get('/api/search/clients?q=client 1').get_json()
+    by_phone = client.get('/api/search/clients?q=%2B79000003').get_json()
+
+    assert {item['label'] for item in by_name} >= {'Client 1 (+79000001)', 'Client 10 (+79000010)'}
+    assert [item['label'] for item in by_phone] == ['Client 3 (+79000003)']
+
+
+def test_schedule_form_takes_trainers_from_cache(client, statements):
+    reference_cache.invalidate()
+    client.get('/add_schedule')
+    statements.clear()
+
+    response = client.get('/add_schedule')
+
+    assert response.status_code == 200
+    assert b'Trainer 0</option>' in response.data
+    assert not [sql for _, sql in statements if 'FROM trainers' in sql]
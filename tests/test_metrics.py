@@ -0,0 +1,71 @@
+import re
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from conftest import DB_DIR
+from db_pool import InstrumentedQueuePool, pool_status
+
+
+def metric(body, name):
+    match = re.search(rf'^{re.escape(name)} (\S+)$', body, re.M)
+    return float(match.group(1)) if match else None
+
+
+def test_metrics_are_local_only_by_default(client):
+    assert client.get('/metrics').status_code == 200
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.1.2.3'}).status_code == 403
+
+
+def test_metrics_token(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 'secret')
+    remote = {'REMOTE_ADDR': '10.1.2.3'}
+
+    assert client.get('/metrics', environ_base=remote, headers={'Authorization': 'Bearer secret'}).status_code == 200
+    assert client.get('/metrics', environ_base=remote, headers={'Authorization': 'Bearer wrong'}).status_code == 403
+
+
+def test_replica_statements_are_counted(client):
+    name = 'db_statements_total{endpoint="table_view"}'
+    before = metric(client.get('/metrics').get_data(as_text=True), name) or 0
+
+    client.get('/table/rooms')
+    body = client.get('/metrics').get_data(as_text=True)
+
+    # Страница читается с реплики, и её запросы тоже попадают в счётчик
+    assert metric(body, name) > before
+    assert metric(body, 'db_pool_checkouts_total{bind="primary"}') is not None
+    assert metric(body, 'db_pool_checkouts_total{bind="replica_0"}') is not None
+
+
+@pytest.fixture
+def engines():
+    engines = [create_engine(f'sqlite:///{DB_DIR}/pool_{i}.db', poolclass=InstrumentedQueuePool, pool_size=1)
+               for i in range(2)]
+    yield engines
+    for engine in engines:
+        engine.dispose()
+
+
+def test_pool_stats_are_kept_per_engine(engines):
+    first, second = engines
+    for _ in range(3):
+        with first.connect() as connection:
+            connection.execute(text('SELECT 1'))
+
+    assert pool_status(first)['checkouts'] == 3
+    assert pool_status(second)['checkouts'] == 0
+
+    # После dispose() пул пересоздаётся, а счётчики остаются
+    first.dispose()
+    with first.connect() as connection:
+        connection.execute(text('SELECT 1'))
+    assert pool_status(first)['checkouts'] == 4
+
+
+def test_admin_pool_lists_replica_pools(client):
+    status = client.get('/admin/pool').get_json()
+
+    assert 'checkouts' in status
+    assert [replica['bind'] for replica in status['replicas']] == ['replica_0']
+    assert 'checkouts' in status['replicas'][0]['pool']
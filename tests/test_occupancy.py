@@ -0,0 +1,73 @@
+from datetime import date, time
+
+import pytest
+from sqlalchemy import func, select
+
+from model import db, Purchased, Record, Room, Schedule, SlotOccupancy, SportType, Trainer
+from occupancy import SlotFull
+
+
+@pytest.fixture
+def small_slot(app):
+    """Занятие в зале на одно место и покупка, действующая в день занятия."""
+    with app.app_context():
+        room = Room(name='Single room', capacity=1)
+        db.session.add(room)
+        db.session.flush()
+        schedule = Schedule(id_trainer=db.session.scalar(select(func.min(Trainer.id_trainer))), id_rooms=room.id_rooms,
+                            id_sport_types=db.session.scalar(select(func.min(SportType.id_sport_types))),
+                            weekday=0, time=time(20, 0), end_time=time(21, 0))
+        db.session.add(schedule)
+        db.session.commit()
+        return schedule.id_schedule, db.session.scalar(select(func.min(Purchased.id_purchased)))
+
+
+def booked(app, id_schedule, day):
+    with app.app_context():
+        return db.session.scalar(select(SlotOccupancy.booked).filter_by(id_schedule=id_schedule, date_of_record=day))
+
+
+def book(client, id_schedule, id_purchased, day):
+    return client.post('/add_record', data={'purchased_id': id_purchased, 'schedule_id': id_schedule,
+                                            'record_date': day.isoformat(), 'attendance': 'Да'},
+                       follow_redirects=True)
+
+
+def test_booking_over_capacity_is_rejected(app, client, small_slot):
+    id_schedule, id_purchased = small_slot
+    day = date(2024, 5, 6)
+
+    assert b'Record added successfully!' in book(client, id_schedule, id_purchased, day).data
+    response = book(client, id_schedule, id_purchased, day)
+
+    assert b'No free places' in response.data
+    assert booked(app, id_schedule, day) == 1
+    with app.app_context():
+        assert db.session.scalar(select(func.count()).where(Record.id_schedule == id_schedule)) == 1
+
+        db.session.add(Record(id_purchased=id_purchased, id_schedule=id_schedule, date_of_record=day,
+                              attendance='Да'))
+        with pytest.raises(SlotFull):
+            db.session.flush()
+        db.session.rollback()
+
+
+def test_delete_and_move_release_places(app, client, small_slot):
+    id_schedule, id_purchased = small_slot
+    day, other_day = date(2024, 5, 13), date(2024, 5, 20)
+    book(client, id_schedule, id_purchased, day)
+    with app.app_context():
+        id_records = db.session.scalar(select(Record.id_records).filter_by(id_schedule=id_schedule,
+                                                                            date_of_record=day))
+
+    response = client.post(f'/edit_record/{id_records}', data={
+        'purchased_id': id_purchased, 'schedule_id': id_schedule, 'record_date': other_day.isoformat(),
+        'attendance': 'Да'})
+    assert response.status_code == 302
+    assert booked(app, id_schedule, day) == 0
+    assert booked(app, id_schedule, other_day) == 1
+    # Освободившееся место снова можно занять
+    assert b'Record added successfully!' in book(client, id_schedule, id_purchased, day).data
+
+    assert client.post(f'/delete_record/{id_records}').status_code == 302
+    assert booked(app, id_schedule, other_day) == 0
@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import update
+
+from cache import reference_cache
+from model import db, Room, TableVersion
+
+
+def room_queries(statements):
+    return [sql for _, sql in statements if 'FROM rooms' in sql]
+
+
+@pytest.fixture
+def cache(app):
+    reference_cache.invalidate()
+    yield reference_cache
+    reference_cache.invalidate()
+
+
+def test_second_read_is_a_cache_hit(app, cache, statements):
+    with app.app_context():
+        first = cache.all(Room)
+        second = cache.all(Room)
+
+    assert second is first
+    assert len(room_queries(statements)) == 1
+
+
+def test_edit_in_this_process_invalidates_after_commit(app, client, cache, statements):
+    with app.app_context():
+        room = cache.get(Room, 2)
+    client.post('/edit_room/2', data={'name': 'Renamed room', 'capacity': str(room.capacity)})
+    statements.clear()
+
+    form = client.get('/add_equipment').data
+
+    assert b'Renamed room' in form
+    assert len(room_queries(statements)) == 1
+
+
+def test_write_by_another_worker_is_seen_after_version_check(app, cache, statements, monkeypatch):
+    with app.app_context():
+        cache.all(Room)
+        # Другой воркер изменил зал: в этом процессе видно только новую версию в table_versions
+        db.session.execute(update(TableVersion).where(TableVersion.table_name == 'rooms')
+                           .values(version=TableVersion.version + 1))
+        db.session.commit()
+        statements.clear()
+
+        cache.all(Room)
+        assert room_queries(statements) == []
+
+        monkeypatch.setattr(cache, '_checked_at', 0.0)
+        cache.all(Room)
+        assert len(room_queries(statements)) == 1
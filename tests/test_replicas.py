@@ -0,0 +1,87 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from conftest import REPLICA, copy_to_replica, login
+from replicas import replica_set
+
+
+def binds(statements):
+    return {key for key, _ in statements}
+
+
+def test_get_reads_from_replica(client, statements):
+    response = client.get('/table/rooms')
+
+    assert response.status_code == 200
+    assert binds(statements) == {'replica_0'}
+
+
+def test_write_and_following_reads_use_primary(client, statements):
+    response = client.post('/add_room', data={'name': 'New room', 'capacity': '5'})
+    assert response.status_code == 302
+    assert binds(statements) == {None}
+
+    # Сразу после своей записи пользователь читает с основной базы — новая строка уже видна
+    statements.clear()
+    response = client.get('/table/rooms?sort=-id_rooms')
+    assert response.status_code == 200
+    assert b'New room' in response.data
+    assert binds(statements) == {None}
+
+
+def test_other_users_still_read_from_replica(app, client, statements):
+    client.post('/add_sport_type', data={'name': 'Boxing'})
+    other = login(app, 'admin')
+
+    statements.clear()
+    assert other.get('/table/sport_types').status_code == 200
+    assert binds(statements) == {'replica_0'}
+
+
+@pytest.fixture
+def broken_replica(app):
+    connection = sqlite3.connect(REPLICA)
+    connection.execute('DROP TABLE equipment')
+    connection.commit()
+    connection.close()
+    yield
+    with app.app_context():
+        copy_to_replica()
+
+
+@pytest.fixture
+def lost_connection(broken_replica):
+    """Ошибки реплики выглядят как разрыв соединения (как при падении сервера)."""
+    engine = replica_set.replicas[0].engine
+
+    def disconnect(context):
+        context.is_disconnect = True
+    event.listen(engine, 'handle_error', disconnect, insert=True)
+    yield
+    event.remove(engine, 'handle_error', disconnect)
+
+
+def test_query_error_keeps_replica(client, statements, broken_replica):
+    # Ошибка самого запроса (таймаут, блокировка, нет таблицы) — не повод выключать реплику
+    with pytest.raises(OperationalError):
+        client.get('/table/equipment')
+
+    assert binds(statements) == {'replica_0'}
+    assert replica_set.replicas[0].healthy
+
+
+def test_lost_replica_falls_back_to_primary(client, statements, lost_connection):
+    response = client.get('/table/equipment')
+
+    assert response.status_code == 200
+    assert b'Mat 0' in response.data
+    assert binds(statements) == {'replica_0', None}
+    assert not replica_set.replicas[0].healthy
+
+    # Пока реплика помечена недоступной, чтение сразу идёт на основную базу
+    statements.clear()
+    assert client.get('/table/equipment').status_code == 200
+    assert binds(statements) == {None}
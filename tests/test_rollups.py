@@ -0,0 +1,42 @@
+from datetime import date
+
+from sqlalchemy import func, select
+
+from conftest import rebuilt_summaries, summaries
+from model import db, Purchased, Record, Schedule
+
+
+def test_orm_changes_keep_rollups_equal_to_rebuild(app):
+    with app.app_context():
+        id_purchased = db.session.scalar(select(func.min(Purchased.id_purchased)))
+        id_schedule, other_schedule = db.session.scalars(
+            select(Schedule.id_schedule).order_by(Schedule.id_schedule).limit(2)).all()
+        record = Record(id_purchased=id_purchased, id_schedule=id_schedule, date_of_record=date(2024, 7, 1),
+                        attendance='Нет')
+        db.session.add(record)
+        db.session.commit()
+        assert summaries() == rebuilt_summaries()
+
+        record.attendance = 'Да'
+        db.session.commit()
+        assert summaries() == rebuilt_summaries()
+
+        # Перенос на другое занятие и в другую неделю
+        record.id_schedule = other_schedule
+        record.date_of_record = date(2024, 7, 10)
+        db.session.commit()
+        assert summaries() == rebuilt_summaries()
+
+        db.session.delete(record)
+        db.session.commit()
+        assert summaries() == rebuilt_summaries()
+
+
+def test_report_reads_rollups(app, client):
+    response = client.get('/api/reports/attendance?group=week&start=2024-01-01&end=2024-01-07')
+
+    assert response.status_code == 200
+    with app.app_context():
+        booked = db.session.scalar(select(func.count()).where(Record.date_of_record.between(
+            date(2024, 1, 1), date(2024, 1, 7))))
+    assert sum(row['booked'] for row in response.get_json()) == booked
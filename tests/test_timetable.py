@@ -0,0 +1,99 @@
+from datetime import date, time
+
+import pytest
+from sqlalchemy import func, select
+
+import timetable
+from model import db, Room, Schedule, SportType, Trainer
+
+# Воскресенье утром в сиде занятий нет
+WEEKDAY = 6
+
+
+@pytest.fixture
+def slot(app):
+    """Занятие 07:00-08:00 в своём зале со своим тренером; второй зал и тренер свободны."""
+    with app.app_context():
+        rooms = [Room(name='Timetable room A', capacity=5), Room(name='Timetable room B', capacity=5)]
+        trainers = [Trainer(full_name=f'Timetable trainer {i}', date_of_birth=date(1985, 1, 1), experience=1,
+                            specialization='yoga') for i in range(2)]
+        db.session.add_all(rooms + trainers)
+        db.session.flush()
+        schedule = Schedule(id_trainer=trainers[0].id_trainer, id_rooms=rooms[0].id_rooms,
+                            id_sport_types=db.session.scalar(select(func.min(SportType.id_sport_types))),
+                            weekday=WEEKDAY, time=time(7, 0), end_time=time(8, 0))
+        db.session.add(schedule)
+        db.session.commit()
+        ids = {'schedule': schedule.id_schedule, 'room': rooms[0].id_rooms, 'other_room': rooms[1].id_rooms,
+               'trainer': trainers[0].id_trainer, 'other_trainer': trainers[1].id_trainer}
+    yield ids
+    with app.app_context():
+        db.session.execute(Schedule.__table__.delete().where(Schedule.weekday == WEEKDAY,
+                                                             Schedule.time < time(10, 0)))
+        db.session.commit()
+
+
+def busy(start, end, room, trainer, exclude_id=None):
+    return [row.id_schedule for row in timetable.conflicts(WEEKDAY, start, end, room, trainer, exclude_id)]
+
+
+@pytest.mark.parametrize('start, end, overlaps', [
+    (time(8, 0), time(9, 0), False),  # начинается ровно в момент окончания
+    (time(6, 0), time(7, 0), False),  # заканчивается ровно в момент начала
+    (time(7, 59), time(9, 0), True),
+    (time(6, 0), time(7, 1), True),
+    (time(7, 15), time(7, 45), True),
+    (time(6, 0), time(9, 0), True),
+])
+def test_touching_slots_do_not_conflict(app, slot, start, end, overlaps):
+    with app.app_context():
+        expected = [slot['schedule']] if overlaps else []
+        assert busy(start, end, slot['room'], slot['other_trainer']) == expected
+        assert busy(start, end, slot['other_room'], slot['trainer']) == expected
+        assert busy(start, end, slot['other_room'], slot['other_trainer']) == []
+
+
+def test_edited_row_is_excluded(app, slot):
+    with app.app_context():
+        assert busy(time(7, 30), time(8, 30), slot['room'], slot['trainer'], exclude_id=slot['schedule']) == []
+
+
+def test_describe_names_room_and_trainer(app, slot):
+    with app.app_context():
+        row = db.session.get(Schedule, slot['schedule'])
+        describe = [timetable.describe(row, room, trainer) for room, trainer in (
+            (slot['room'], slot['other_trainer']), (slot['other_room'], slot['trainer']),
+            (slot['room'], slot['trainer']))]
+
+    suffix = f'#{slot["schedule"]} {row.day_of_week} 07:00-08:00'
+    assert describe == [f'room busy: {suffix}', f'trainer busy: {suffix}', f'room and trainer busy: {suffix}']
+
+
+def test_add_schedule_flashes_conflict(app, client, slot):
+    response = client.post('/add_schedule', data={
+        'trainer_id': slot['other_trainer'], 'room_id': slot['room'], 'sport_type_id': '1',
+        'weekday': str(WEEKDAY), 'time': '07:30', 'end_time': '08:30'}, follow_redirects=True)
+
+    assert f'room busy: #{slot["schedule"]}'.encode() in response.data
+    with app.app_context():
+        assert busy(time(7, 0), time(9, 0), slot['room'], slot['trainer']) == [slot['schedule']]
+
+
+def test_all_conflicts_reports_overlaps_only(app, slot):
+    with app.app_context():
+        sport_type = db.session.scalar(select(func.min(SportType.id_sport_types)))
+        adjacent = Schedule(id_trainer=slot['trainer'], id_rooms=slot['room'], id_sport_types=sport_type,
+                            weekday=WEEKDAY, time=time(8, 0), end_time=time(9, 0))
+        overlapping = Schedule(id_trainer=slot['trainer'], id_rooms=slot['other_room'], id_sport_types=sport_type,
+                               weekday=WEEKDAY, time=time(7, 30), end_time=time(8, 30))
+        # Минуя форму: так конфликт мог появиться до проверок
+        db.session.add_all([adjacent, overlapping])
+        db.session.commit()
+
+        pairs = {(row['first'].id_schedule, row['second'].id_schedule): (row['kind'], row['room'], row['trainer'])
+                 for row in timetable.all_conflicts() if row['first'].weekday == WEEKDAY}
+
+    assert pairs == {
+        (slot['schedule'], overlapping.id_schedule): ('trainer', None, 'Timetable trainer 0'),
+        (adjacent.id_schedule, overlapping.id_schedule): ('trainer', None, 'Timetable trainer 0'),
+    }
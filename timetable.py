@@ -0,0 +1,72 @@
+from datetime import time
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import aliased
+
+from model import db, DAYS, Room, Schedule, Trainer
+
+
+def parse_weekday(value):
+    """Номер дня (0-6) или название из DAYS."""
+    value = (value or '').strip()
+    if value.isdigit() and int(value) < len(DAYS):
+        return int(value)
+    for weekday, name in enumerate(DAYS):
+        if name.lower() == value.lower():
+            return weekday
+    raise ValueError(f'unknown day of week: {value!r}')
+
+
+def parse_time(value):
+    return time.fromisoformat(value.strip())
+
+
+def conflicts(weekday, start, end, id_rooms, id_trainer, exclude_id=None):
+    """Занятия, пересекающиеся по времени в том же зале или у того же тренера.
+
+    Каждая ветка OR — диапазон по индексу (id_rooms|id_trainer, weekday, time), без просмотра всего расписания.
+    """
+    query = Schedule.query.filter(
+        or_(Schedule.id_rooms == id_rooms, Schedule.id_trainer == id_trainer),
+        Schedule.weekday == weekday,
+        Schedule.time < end,
+        Schedule.end_time > start,
+    )
+    if exclude_id is not None:
+        query = query.filter(Schedule.id_schedule != exclude_id)
+    return query.order_by(Schedule.time).all()
+
+
+def describe(slot, id_rooms, id_trainer):
+    reasons = []
+    if slot.id_rooms == int(id_rooms):
+        reasons.append('room')
+    if slot.id_trainer == int(id_trainer):
+        reasons.append('trainer')
+    return f'{" and ".join(reasons)} busy: #{slot.id_schedule} {slot.day_of_week} ' \
+           f'{slot.time:%H:%M}-{slot.end_time:%H:%M}'
+
+
+def all_conflicts():
+    """Все пары пересекающихся занятий (проверка всего расписания одним запросом)."""
+    other = aliased(Schedule)
+    same_room = Schedule.id_rooms == other.id_rooms
+    same_trainer = Schedule.id_trainer == other.id_trainer
+    rows = db.session.query(Schedule, other, same_room, same_trainer, Room.name, Trainer.full_name) \
+        .join(other, and_(
+            Schedule.id_schedule < other.id_schedule,
+            Schedule.weekday == other.weekday,
+            Schedule.time < other.end_time,
+            other.time < Schedule.end_time,
+            or_(same_room, same_trainer),
+        )) \
+        .join(Room, Room.id_rooms == Schedule.id_rooms) \
+        .join(Trainer, Trainer.id_trainer == Schedule.id_trainer) \
+        .order_by(Schedule.weekday, Schedule.time, Schedule.id_schedule, other.id_schedule)
+    return [{
+        'first': first,
+        'second': second,
+        'kind': ' and '.join(kind for kind, flag in (('room', room), ('trainer', trainer)) if flag),
+        'room': room_name if room else None,
+        'trainer': trainer_name if trainer else None,
+    } for first, second, room, trainer, room_name, trainer_name in rows]
@@ -0,0 +1,114 @@
+from itertools import chain
+
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from model import db, TableVersion
+
+# Таблицы, запись в которые увеличивает счётчик в table_versions
+TRACKED = set()
+
+_commit_callbacks = []
+
+
+def track(*models):
+    TRACKED.update(model.__tablename__ for model in models)
+
+
+def on_commit(callback):
+    """Регистрирует callback(tables), вызываемый после коммита с изменёнными таблицами."""
+    _commit_callbacks.append(callback)
+    return callback
+
+
+# INSERT ... ON CONFLICT DO UPDATE: первая запись в таблицу не падает на гонке UPDATE/INSERT
+UPSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def bump(connection, tables):
+    """Увеличивает версии таблиц в текущей транзакции."""
+    versions = TableVersion.__table__
+    upsert = UPSERTS.get(connection.dialect.name)
+    for table_name in sorted(tables):
+        if upsert is not None:
+            connection.execute(
+                upsert(versions).values(table_name=table_name, version=1, updated_at=func.now())
+                .on_conflict_do_update(index_elements=[versions.c.table_name],
+                                       set_={'version': versions.c.version + 1, 'updated_at': func.now()})
+            )
+            continue
+        result = connection.execute(
+            versions.update()
+            .where(versions.c.table_name == table_name)
+            .values(version=versions.c.version + 1, updated_at=func.now())
+        )
+        if result.rowcount == 0:
+            connection.execute(versions.insert().values(table_name=table_name, version=1, updated_at=func.now()))
+
+
+def seed(connection, tables=None):
+    """Строки table_versions для отслеживаемых таблиц, которых ещё нет (версия 0)."""
+    versions = TableVersion.__table__
+    existing = set(connection.execute(select(versions.c.table_name)).scalars())
+    missing = sorted(set(tables if tables is not None else TRACKED) - existing)
+    if missing:
+        connection.execute(versions.insert(), [{'table_name': name, 'version': 0} for name in missing])
+
+
+def mark_changed(session, tables):
+    """Для изменений в обход ORM (bulk insert/update/delete): версии увеличатся при коммите."""
+    tables = set(tables) & TRACKED
+    if tables:
+        session.info.setdefault('changed_tables', set()).update(tables)
+
+
+def current_versions(tables):
+    """Возвращает {table_name: (version, updated_at)} одним запросом."""
+    rows = db.session.query(TableVersion.table_name, TableVersion.version, TableVersion.updated_at) \
+        .filter(TableVersion.table_name.in_(list(tables))).all()
+    versions = {table_name: (0, None) for table_name in tables}
+    versions.update((row.table_name, (row.version, row.updated_at)) for row in rows)
+    return versions
+
+
+@event.listens_for(Session, 'after_flush')
+def _after_flush(session, flush_context):
+    if not TRACKED:
+        return
+    # В after_flush списки new/dirty/deleted ещё содержат состояние до flush
+    changed = set()
+    for obj in chain(session.new, session.deleted):
+        changed.add(obj.__table__.name)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            changed.add(obj.__table__.name)
+    mark_changed(session, changed)
+
+
+@event.listens_for(Session, 'before_commit')
+def _before_commit(session):
+    # Оставшиеся изменения сбрасываются сейчас, чтобы версии увеличились последним запросом транзакции:
+    # блокировка строки счётчика держится только до COMMIT, а не всю транзакцию
+    session.flush()
+    changed = session.info.get('changed_tables')
+    if changed:
+        bump(session.connection(), changed)
+
+
+@event.listens_for(TableVersion.__table__, 'after_create')
+def _seed_versions(target, connection, **kw):
+    seed(connection)
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    changed = session.info.pop('changed_tables', None)
+    if changed:
+        for callback in _commit_callbacks:
+            callback(changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('changed_tables', None)